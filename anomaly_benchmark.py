@@ -0,0 +1,97 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from anomaly_detection import adjust_threshold, classify_anomalies, extract_features, fit_anomaly_models, label_anomalies
+
+
+def synthetic_attendance(rows: int, employees: int, seed: int = 0) -> pd.DataFrame:
+    """Random attendance frame with the columns `get_anomaly_models` loads."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+    present = rng.random(rows) < 0.9
+    checkin = days + pd.to_timedelta(rng.integers(480, 600, rows), unit="m")
+    checkout = days + pd.to_timedelta(rng.integers(780, 1260, rows), unit="m")
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "employee_id": rng.integers(1, employees + 1, rows),
+        "date": days.date,
+        "checkin_time": checkin.where(present),
+        "checkout_time": checkout.where(present),
+        "status": np.where(present, "present", "leave")
+    })
+
+
+def per_row_features(attendance_data: pd.DataFrame):
+    """The per-employee Python loops the features were computed with before vectorization."""
+    for _, employee_data in attendance_data.groupby("employee_id"):
+        [t.hour * 60 + t.minute if not pd.isna(t) else 0 for t in employee_data["checkin_time"]]
+        [t.hour * 60 + t.minute if not pd.isna(t) else 0 for t in employee_data["checkout_time"]]
+        len([s for s in employee_data["status"] if s == "present"]) / len(employee_data["status"])
+
+
+def per_row_classification(attendance_data: pd.DataFrame, scores: np.ndarray, anomaly_threshold: float) -> int:
+    """The iloc loop hits were classified with before, without building response objects."""
+    adjusted_threshold = adjust_threshold(anomaly_threshold)
+    hits = 0
+    for index, score in enumerate(scores):
+        if score < adjusted_threshold:
+            attendance_data.iloc[index]["date"]
+            attendance_data.iloc[index]["checkin_time"]
+            attendance_data.iloc[index]["checkout_time"]
+            hits += 1
+    return hits
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark anomaly feature extraction, classification and model fitting.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic attendance records")
+    parser.add_argument("--employees", type=int, default=4000)
+    parser.add_argument("--threshold", type=float, default=0.5, help="API anomaly threshold (0-1)")
+    parser.add_argument("--per-row-sample", type=int, default=100_000,
+                        help="Rows timed with the per-row classification loop; the result is extrapolated")
+    parser.add_argument("--fit-employees", type=int, default=200, help="Employees whose models are fitted")
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes for the parallel fit (-1: every core)")
+    args = parser.parse_args()
+
+    attendance_data = synthetic_attendance(args.rows, args.employees)
+    scores = -np.random.default_rng(1).uniform(0.3, 0.8, args.rows)
+    print(f"{args.rows} records, {args.employees} employees")
+
+    _, seconds = _timed(per_row_features, attendance_data)
+    print(f"features, per-row loops:  {seconds:.2f}s")
+    features, seconds = _timed(extract_features, attendance_data)
+    print(f"features, vectorized:     {seconds:.2f}s")
+
+    sample = min(args.per_row_sample, args.rows)
+    _, seconds = _timed(per_row_classification, attendance_data.iloc[:sample], scores[:sample], args.threshold)
+    print(f"classify, per-row loop:   {seconds:.2f}s for {sample} rows (~{seconds * args.rows / sample:.1f}s for all)")
+
+    def vectorized_classification():
+        scored = features.assign(anomaly_score=scores, employee_name="", detected_date=None)
+        hits = label_anomalies(scored[scored["anomaly_score"] < adjust_threshold(args.threshold)])
+        return classify_anomalies(hits, args.threshold)
+
+    anomalies, seconds = _timed(vectorized_classification)
+    print(f"classify, vectorized:     {seconds:.2f}s ({len(anomalies)} anomalies)")
+
+    fit_ids = features["employee_id"].drop_duplicates().sort_values().head(args.fit_employees)
+    groups = list(features[features["employee_id"].isin(fit_ids)].groupby("employee_id"))
+    serial, seconds = _timed(fit_anomaly_models, groups, 1)
+    print(f"fit {len(groups)} models, serial:      {seconds:.2f}s")
+    parallel, seconds = _timed(fit_anomaly_models, groups, args.jobs)
+    print(f"fit {len(groups)} models, n_jobs={args.jobs}: {seconds:.2f}s")
+
+    identical = all(
+        np.array_equal(a.scored["anomaly_score"].to_numpy(), b.scored["anomaly_score"].to_numpy())
+        for a, b in zip(serial, parallel)
+    )
+    print(f"parallel scores identical to serial: {identical}")
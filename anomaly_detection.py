@@ -0,0 +1,240 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from attendance_snapshot import load_attendance
+from config import settings
+from model_registry import ModelRegistry
+from models import Attendance
+
+# Fitted per-employee models, reused across requests until the employee's attendance changes
+anomaly_models = ModelRegistry(max_bytes=settings.ANOMALY_MODEL_CACHE_MAX_BYTES)
+
+class AnomalyLevel:
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+
+class AnomalyType:
+    LATE_CHECKIN = "Late Check-in"
+    EARLY_CHECKOUT = "Early Check-out"
+    LOW_ATTENDANCE = "Low Attendance"
+    IRREGULAR_PATTERN = "Irregular Pattern"
+
+# Thresholds used to explain why a row was flagged
+LATE_CHECKIN_MINUTE = 9 * 60  # Check-in at 09:00 or later
+EARLY_CHECKOUT_MINUTE = 17 * 60  # Check-out before 17:00
+LOW_ATTENDANCE_RATE = 0.8
+
+FEATURE_COLUMNS = ['checkin_minutes', 'checkout_minutes', 'attendance_rate']
+
+def adjust_threshold(anomaly_threshold: float) -> float:
+    # Convert the threshold from 0-1 range to isolation forest score range
+    # Isolation Forest scores are typically between -0.5 and 0.5
+    return -1 * (1 - anomaly_threshold)  # Convert 0-1 to 0 to -1
+
+def extract_features(attendance_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes model features for the whole attendance frame at once.
+
+    Returns:
+        pd.DataFrame: One row per attendance record with the attendance and
+                      employee ids, date, check-in/check-out minutes since
+                      midnight (NaN when missing) and the employee's overall
+                      attendance rate.
+    """
+    checkin = pd.to_datetime(attendance_data['checkin_time'])
+    checkout = pd.to_datetime(attendance_data['checkout_time'])
+    is_present = attendance_data['status'] == 'present'
+
+    return pd.DataFrame({
+        'attendance_id': attendance_data['id'],
+        'employee_id': attendance_data['employee_id'],
+        'date': attendance_data['date'],
+        'has_checkin': checkin.notna(),
+        'has_checkout': checkout.notna(),
+        # Convert times to minutes since midnight for numerical analysis
+        'checkin_minutes': (checkin.dt.hour * 60 + checkin.dt.minute).astype(float),
+        'checkout_minutes': (checkout.dt.hour * 60 + checkout.dt.minute).astype(float),
+        'attendance_rate': is_present.groupby(attendance_data['employee_id']).transform('mean'),
+    }, index=attendance_data.index)
+
+class FittedAnomalyModel:
+    """Scaler and Isolation Forest fitted on one employee, with the scored training rows."""
+
+    def __init__(self, scaler, clf, scored):
+        self.scaler = scaler
+        self.clf = clf
+        self.scored = scored
+
+def fit_anomaly_model(emp_features: pd.DataFrame) -> FittedAnomalyModel:
+    X = emp_features[FEATURE_COLUMNS].to_numpy(dtype=float)
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    clf = IsolationForest(
+        contamination=0.1,
+        random_state=42,
+        n_estimators=100
+    )
+
+    clf.fit(X_scaled)
+
+    scored = emp_features.drop(columns=['employee_id']).reset_index(drop=True)
+    scored['anomaly_score'] = clf.score_samples(X_scaled)
+
+    return FittedAnomalyModel(scaler=scaler, clf=clf, scored=scored)
+
+def fit_anomaly_models(employee_groups, n_jobs: int = 1) -> List[FittedAnomalyModel]:
+    """
+    Fits one model per (employee_id, emp_features) group, fanning out across
+    worker processes when `n_jobs` is not 1. Every model uses a fixed
+    random_state, so results are identical to the serial path.
+    """
+    if n_jobs == 1 or len(employee_groups) < 2:
+        return [fit_anomaly_model(emp_features) for _, emp_features in employee_groups]
+
+    return Parallel(n_jobs=n_jobs)(
+        delayed(fit_anomaly_model)(emp_features) for _, emp_features in employee_groups
+    )
+
+def attendance_watermarks(db: Session, employee_ids: Optional[Iterable[int]] = None) -> Dict[int, tuple]:
+    """Returns {employee_id: (max attendance id, row count)} for employees with attendance."""
+    query = db.query(
+        Attendance.employee_id,
+        func.max(Attendance.id),
+        func.count(Attendance.id)
+    )
+    if employee_ids is not None:
+        query = query.filter(Attendance.employee_id.in_(list(employee_ids)))
+
+    return {
+        employee_id: (max_id, row_count)
+        for employee_id, max_id, row_count in query.group_by(Attendance.employee_id).all()
+    }
+
+def get_anomaly_models(db: Session, employee_ids: Optional[Iterable[int]] = None) -> Dict[int, FittedAnomalyModel]:
+    """
+    Returns a fitted model for every employee (or each of `employee_ids`)
+    with attendance records.
+
+    Models are looked up in the registry by (employee, max attendance id, row
+    count); only employees whose attendance changed since their model was
+    fitted are reloaded and refit.
+    """
+    watermarks = attendance_watermarks(db, employee_ids)
+
+    models = {}
+    stale = []
+    for employee_id, watermark in watermarks.items():
+        model = anomaly_models.get(employee_id, watermark)
+        if model is None:
+            stale.append(employee_id)
+        else:
+            models[employee_id] = model
+
+    if stale:
+        # Only the columns the features need, not every attendance column
+        attendance_data = load_attendance(
+            db,
+            ['id', 'employee_id', 'date', 'checkin_time', 'checkout_time', 'status'],
+            employee_ids=stale if employee_ids is not None or len(stale) < len(watermarks) else None
+        )
+
+        employee_groups = list(extract_features(attendance_data).groupby('employee_id'))
+        fitted = fit_anomaly_models(employee_groups, n_jobs=settings.ANOMALY_N_JOBS)
+
+        for (employee_id, _), model in zip(employee_groups, fitted):
+            employee_id = int(employee_id)
+            anomaly_models.put(employee_id, watermarks[employee_id], model)
+            models[employee_id] = model
+
+    return models
+
+def label_anomalies(scored: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the threshold-independent explanation columns to scored rows:
+    late check-in / early checkout / low attendance flags and the anomaly type.
+    """
+    late = scored['has_checkin'] & (scored['checkin_minutes'] >= LATE_CHECKIN_MINUTE)
+    early = scored['has_checkout'] & (scored['checkout_minutes'] < EARLY_CHECKOUT_MINUTE)
+    low = scored['attendance_rate'] < LOW_ATTENDANCE_RATE
+
+    labelled = scored.assign(
+        is_late_checkin=late,
+        is_early_checkout=early,
+        is_low_attendance=low
+    )
+    # Determine anomaly type based on patterns, in priority order
+    labelled['anomaly_type'] = np.select(
+        [late.to_numpy(), early.to_numpy(), low.to_numpy()],
+        [AnomalyType.LATE_CHECKIN, AnomalyType.EARLY_CHECKOUT, AnomalyType.LOW_ATTENDANCE],
+        default=AnomalyType.IRREGULAR_PATTERN
+    )
+    return labelled
+
+def classify_anomalies(hits: pd.DataFrame, anomaly_threshold: float) -> List[dict]:
+    """
+    Builds API anomaly records for labelled rows already below the threshold.
+
+    Args:
+        hits (pd.DataFrame): Rows with `employee_id`, `employee_name`, `date`,
+                             `anomaly_score`, `anomaly_type`, `detected_date`
+                             and the flag columns from `label_anomalies`.
+        anomaly_threshold (float): Threshold in the 0-1 range used by the API.
+
+    Returns:
+        List[dict]: Anomalies in the order of `hits`.
+    """
+    if hits.empty:
+        return []
+
+    adjusted_threshold = adjust_threshold(anomaly_threshold)
+    late = hits['is_late_checkin'].to_numpy(dtype=bool)
+    early = hits['is_early_checkout'].to_numpy(dtype=bool)
+    low = hits['is_low_attendance'].to_numpy(dtype=bool)
+
+    # Dynamic severity based on normalized score difference
+    score_diff = (adjusted_threshold - hits['anomaly_score'].to_numpy()) / 2  # Normalize to 0-1 range
+    severity = np.select(
+        [score_diff > 0.5, score_diff > 0.25],
+        [AnomalyLevel.HIGH, AnomalyLevel.MEDIUM],
+        default=AnomalyLevel.LOW
+    )
+
+    description = (
+        "Unusual attendance pattern detected on " + hits['date'].astype(str)
+        + " (Anomaly Score: " + hits['anomaly_score'].map('{:.3f}'.format) + "). "
+        + np.where(late, "Late check-in. ", "")
+        + np.where(early, "Early checkout. ", "")
+        + np.where(low, "Low attendance rate. ", "")
+    )
+
+    # Building records from plain lists avoids DataFrame.to_dict's per-cell boxing
+    return [
+        {
+            "employee_id": employee_id,
+            "employee_name": employee_name,
+            "anomaly_type": anomaly_type,
+            "description": description,
+            "severity": severity,
+            "detected_date": detected_date,
+            "anomaly_score": abs(score)
+        }
+        for employee_id, employee_name, anomaly_type, description, severity, detected_date, score in zip(
+            hits['employee_id'].tolist(),
+            hits['employee_name'].tolist(),
+            hits['anomaly_type'].tolist(),
+            description.tolist(),
+            severity.tolist(),
+            hits['detected_date'].tolist(),
+            hits['anomaly_score'].tolist()
+        )
+    ]
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Iterable, Optional
+
+import pandas as pd
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from anomaly_detection import anomaly_models, attendance_watermarks, get_anomaly_models, label_anomalies
+from database import SessionLocal, engine, Base
+from models import AttendanceAnomalyRecord
+from response_cache import response_cache
+
+RECORD_COLUMNS = [
+    'attendance_id', 'employee_id', 'date', 'anomaly_score', 'anomaly_type',
+    'is_late_checkin', 'is_early_checkout', 'is_low_attendance'
+]
+
+logger = logging.getLogger(__name__)
+
+# Serializes the background job with on-demand rescores so they never interleave deletes and inserts
+_scoring_lock = threading.Lock()
+
+
+def _persisted_watermarks(db: Session, employee_ids: Optional[Iterable[int]] = None) -> dict:
+    query = db.query(
+        AttendanceAnomalyRecord.employee_id,
+        func.max(AttendanceAnomalyRecord.attendance_id),
+        func.count(AttendanceAnomalyRecord.id)
+    )
+    if employee_ids is not None:
+        query = query.filter(AttendanceAnomalyRecord.employee_id.in_(list(employee_ids)))
+
+    return {
+        employee_id: (max_id, row_count)
+        for employee_id, max_id, row_count in query.group_by(AttendanceAnomalyRecord.employee_id).all()
+    }
+
+
+def score_attendance(db: Session, employee_ids: Optional[Iterable[int]] = None, force: bool = False) -> int:
+    """
+    Rescores employees whose attendance changed since they were last persisted.
+
+    A refit changes the scores of every row of that employee, so their rows in
+    `attendance_anomalies` are replaced as a whole.
+
+    Args:
+        db (Session): Database session.
+        employee_ids (Optional[Iterable[int]]): Limit the run to these employees.
+        force (bool): Rescore even if the persisted scores look current.
+
+    Returns:
+        int: Number of attendance records scored.
+    """
+    if employee_ids is not None:
+        employee_ids = list(employee_ids)
+
+    with _scoring_lock:
+        current = attendance_watermarks(db, employee_ids)
+        persisted = _persisted_watermarks(db, employee_ids)
+
+        stale = [
+            employee_id for employee_id, watermark in current.items()
+            if force or persisted.get(employee_id) != watermark
+        ]
+        removed = [employee_id for employee_id in persisted if employee_id not in current]
+        if not stale and not removed:
+            return 0
+
+        models = get_anomaly_models(db, stale) if stale else {}
+
+        db.query(AttendanceAnomalyRecord).filter(
+            AttendanceAnomalyRecord.employee_id.in_(stale + removed)
+        ).delete(synchronize_session=False)
+
+        scored_rows = 0
+        if models:
+            employee_order = sorted(models)
+            labelled = label_anomalies(pd.concat(
+                [models[employee_id].scored for employee_id in employee_order],
+                keys=employee_order,
+                names=['employee_id', None]
+            ).reset_index(level='employee_id'))
+
+            scored_at = datetime.utcnow()
+            records = [
+                dict(zip(RECORD_COLUMNS, row), scored_at=scored_at)
+                for row in zip(*(labelled[column].tolist() for column in RECORD_COLUMNS))
+            ]
+            db.execute(insert(AttendanceAnomalyRecord), records)
+            scored_rows = len(records)
+
+        db.commit()
+        response_cache.invalidate("anomalies")
+        return scored_rows
+
+
+def rescore_employee(db: Session, employee_id: int) -> int:
+    """Refits one employee's model from scratch and replaces its persisted scores."""
+    anomaly_models.discard(employee_id)
+    return score_attendance(db, [employee_id], force=True)
+
+
+def score_pending() -> int:
+    db = SessionLocal()
+    try:
+        return score_attendance(db)
+    finally:
+        db.close()
+
+
+async def run_scoring_loop(interval_seconds: int):
+    """Periodically scores new attendance in a worker thread until cancelled."""
+    while True:
+        try:
+            await asyncio.to_thread(score_pending)
+        except Exception:
+            logger.exception("Error scoring attendance anomalies")
+        await asyncio.sleep(interval_seconds)
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    print(f"Scored {score_pending()} attendance records")
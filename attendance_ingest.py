@@ -0,0 +1,248 @@
+import argparse
+import csv
+import io
+import json
+import time
+from itertools import islice
+from typing import Iterable, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from anomaly_detection import anomaly_models
+from attendance_rollup import apply_attendance_rows, refresh_rollup_days
+from attendance_summary import apply_summary_rows, refresh_summaries
+from attendance_snapshot import mark_months_changed
+from database import SessionLocal, engine, Base, upsert
+from models import Attendance, AttendanceAnomalyRecord, Employee
+from prophet_store import mark_employees_updated
+from response_cache import response_cache
+from schemas.schemas import AttendanceCreate
+
+ATTENDANCE_STATUSES = ('present', 'leave', 'holiday')
+FIELDS = ('employee_id', 'date', 'checkin_time', 'checkout_time', 'status')
+LOOKUP_CHUNK_SIZE = 500  # Keeps IN lists well below SQLite's bound parameter limit
+
+
+class TooManyRecords(ValueError):
+    """Raised when an upload holds more records than the caller accepts."""
+
+
+def _limited(rows: Iterable, max_rows: Optional[int]) -> List:
+    """Collects `rows`, stopping as soon as there is one more than `max_rows`."""
+    if max_rows is None:
+        return list(rows)
+    collected = list(islice(rows, max_rows + 1))
+    if len(collected) > max_rows:
+        raise TooManyRecords(f"At most {max_rows} records per request")
+    return collected
+
+
+def parse_attendance_payload(body: bytes, content_type: str, max_rows: Optional[int] = None) -> List[dict]:
+    """
+    Parses an upload into raw row dicts: a JSON array, NDJSON (one object per
+    line) or CSV with a header row. Empty CSV cells are read as missing values.
+
+    NDJSON and CSV are parsed record by record and stop at the first record
+    beyond `max_rows`, so an oversized upload is rejected without parsing it all.
+
+    Raises:
+        TooManyRecords: If the body holds more than `max_rows` records.
+        ValueError: If the body cannot be parsed in the given format.
+    """
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+    text = body.decode("utf-8-sig")
+
+    if media_type in ("text/csv", "application/csv"):
+        return _limited((
+            {field: value if value != "" else None for field, value in row.items()}
+            for row in csv.DictReader(io.StringIO(text))
+        ), max_rows)
+
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        try:
+            return _limited((json.loads(line) for line in text.splitlines() if line.strip()), max_rows)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid NDJSON: {e}")
+
+    if media_type == "application/json":
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise ValueError("Expected a JSON array of attendance records")
+        return _limited(rows, max_rows)
+
+    raise ValueError(f"Unsupported content type '{media_type}'. Use application/json, application/x-ndjson or text/csv.")
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'record'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def _chunks(values: list, size: int = LOOKUP_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def ingest_attendance(db: Session, rows: Iterable[dict]) -> dict:
+    """
+    Validates and upserts attendance records by (employee_id, date) in a
+    single transaction.
+
+    Invalid rows are skipped and reported. The valid ones are inserted with
+    one executemany upsert that skips existing keys; the rest then overwrite
+    their stored record only where a field differs. Both statements return
+    the keys they actually wrote, and the daily rollup and summaries are
+    maintained from those in the same transaction, so concurrent ingests of
+    the same records never count them twice. Re-sending a payload is a no-op.
+
+    Args:
+        db (Session): Database session.
+        rows (Iterable[dict]): Raw records as parsed from the upload.
+
+    Returns:
+        dict: received/inserted/updated/unchanged counts, per-row errors and
+              per-row outcomes ("inserted", "updated", "unchanged" or None if rejected).
+    """
+    errors = []
+    records = {}  # (employee_id, date) -> (row number, validated record)
+    received = 0
+
+    for index, row in enumerate(rows):
+        received += 1
+        try:
+            record = AttendanceCreate.model_validate(row)
+        except ValidationError as e:
+            errors.append({"row": index, "employee_id": None, "date": None, "error": _format_validation_error(e)})
+            continue
+
+        key = (record.employee_id, record.date)
+        if record.status not in ATTENDANCE_STATUSES:
+            errors.append({"row": index, "employee_id": key[0], "date": key[1],
+                           "error": f"status must be one of {', '.join(ATTENDANCE_STATUSES)}"})
+        elif key in records:
+            errors.append({"row": index, "employee_id": key[0], "date": key[1],
+                           "error": f"duplicate of row {records[key][0]}"})
+        else:
+            records[key] = (index, record)
+
+    # Batch check: one query per chunk of employees, however many rows were sent
+    employee_ids = sorted({employee_id for employee_id, _ in records})
+    known_employees = set()
+    for chunk in _chunks(employee_ids):
+        known_employees.update(
+            employee_id for employee_id, in db.query(Employee.employee_id).filter(Employee.employee_id.in_(chunk))
+        )
+    for key in [key for key in records if key[0] not in known_employees]:
+        index, _ = records.pop(key)
+        errors.append({"row": index, "employee_id": key[0], "date": key[1], "error": "employee not found"})
+
+    values = {
+        key: {**{field: getattr(record, field) for field in FIELDS}, 'is_weekday': key[1].weekday() < 5}
+        for key, (_, record) in records.items()
+    }
+    key_columns = (Attendance.employee_id, Attendance.date)
+
+    # New keys are inserted; keys another writer already holds are left for the update below
+    inserted = set()
+    if values:
+        inserted.update(db.execute(
+            upsert(db, Attendance, ['employee_id', 'date']).returning(*key_columns),
+            list(values.values())
+        ).tuples())
+
+    # Existing records are overwritten only where a field differs, so unchanged ones are not returned
+    updated = set()
+    existing = [row for key, row in values.items() if key not in inserted]
+    if existing:
+        updated.update(db.execute(
+            upsert(
+                db, Attendance, ['employee_id', 'date'],
+                update=lambda excluded: {field: excluded[field] for field in FIELDS[2:]},
+                where=lambda excluded: or_(*(getattr(Attendance, field).is_distinct_from(excluded[field]) for field in FIELDS[2:]))
+            ).returning(*key_columns),
+            existing
+        ).tuples())
+
+    inserts = [tuple(values[key][field] for field in FIELDS) for key in inserted]
+
+    # Changed rows can move first/last minutes, so their days are recomputed
+    changed_days = {day for _, day in updated}
+    apply_attendance_rows(db, (
+        (employee_id, day, status, checkin_time, checkout_time)
+        for employee_id, day, checkin_time, checkout_time, status in inserts
+        if day not in changed_days
+    ))
+    refresh_rollup_days(db, changed_days)
+
+    # Likewise for the summaries of employees with changed rows
+    changed_employees = {employee_id for employee_id, _ in updated}
+    apply_summary_rows(db, (
+        (employee_id, day, status, checkin_time, checkout_time)
+        for employee_id, day, checkin_time, checkout_time, status in inserts
+        if employee_id not in changed_employees
+    ))
+    refresh_summaries(db, changed_employees)
+    written_days = [day for _, day in inserted] + list(changed_days)
+    mark_months_changed(db, written_days)
+
+    # In-place updates keep the (max id, count) watermark, so move the forecast
+    # models' update counters and drop the affected anomaly scores explicitly
+    mark_employees_updated(db, changed_employees)
+    if changed_employees:
+        db.query(AttendanceAnomalyRecord).filter(
+            AttendanceAnomalyRecord.employee_id.in_(changed_employees)
+        ).delete(synchronize_session=False)
+
+    db.commit()
+    for employee_id in changed_employees:
+        anomaly_models.discard(employee_id)
+    response_cache.invalidate_days("attendance", written_days)
+    if changed_employees:
+        response_cache.invalidate("anomalies")
+
+    outcomes = [None] * received
+    for key, (index, _) in records.items():
+        outcomes[index] = "inserted" if key in inserted else "updated" if key in updated else "unchanged"
+
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "received": received,
+        "inserted": len(inserted),
+        "updated": len(updated),
+        "unchanged": len(records) - len(inserted) - len(updated),
+        "errors": errors,
+        "outcomes": outcomes
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load attendance records from a file.")
+    parser.add_argument("path", help="JSON array, NDJSON (.ndjson/.jsonl) or CSV (.csv) file")
+    args = parser.parse_args()
+
+    content_type = {"csv": "text/csv", "ndjson": "application/x-ndjson", "jsonl": "application/x-ndjson"}.get(
+        args.path.rsplit(".", 1)[-1].lower(), "application/json"
+    )
+    with open(args.path, "rb") as f:
+        rows = parse_attendance_payload(f.read(), content_type)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        result = ingest_attendance(db, rows)
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+
+    print(f"Received {result['received']}: {result['inserted']} inserted, {result['updated']} updated, "
+          f"{result['unchanged']} unchanged, {len(result['errors'])} rejected in {elapsed:.2f}s")
+    for error in result["errors"]:
+        print(f"  row {error['row']}: {error['error']}")
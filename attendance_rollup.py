@@ -0,0 +1,226 @@
+import argparse
+from collections import Counter
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine, Base, upsert
+from models import Employee, Attendance, AttendanceDailyRollup
+
+DEPARTMENT_TOTAL = AttendanceDailyRollup.DEPARTMENT_TOTAL
+
+
+def minute_of_day(value: Optional[datetime]) -> Optional[int]:
+    return value.hour * 60 + value.minute if value else None
+
+
+class _Bucket:
+    """In-memory accumulator for one rollup row."""
+
+    def __init__(self):
+        self.total = 0
+        self.present = 0
+        self.leave = 0
+        self.holiday = 0
+        self.first_checkin_minute = None
+        self.last_checkout_minute = None
+        self.checkin_histogram = Counter()
+        self.checkout_histogram = Counter()
+
+    def add(self, status: str, checkin_time: Optional[datetime], checkout_time: Optional[datetime]):
+        checkin = minute_of_day(checkin_time)
+        checkout = minute_of_day(checkout_time)
+
+        self.total += 1
+        if status == 'present':
+            self.present += 1
+            if checkin is not None and (self.first_checkin_minute is None or checkin < self.first_checkin_minute):
+                self.first_checkin_minute = checkin
+            if checkout is not None and (self.last_checkout_minute is None or checkout > self.last_checkout_minute):
+                self.last_checkout_minute = checkout
+        elif status == 'leave':
+            self.leave += 1
+        elif status == 'holiday':
+            self.holiday += 1
+
+        if checkin is not None:
+            self.checkin_histogram[str(checkin)] += 1
+        if checkout is not None:
+            self.checkout_histogram[str(checkout)] += 1
+
+    def merge_into(self, row: AttendanceDailyRollup):
+        row.total = (row.total or 0) + self.total
+        row.present = (row.present or 0) + self.present
+        row.leave = (row.leave or 0) + self.leave
+        row.holiday = (row.holiday or 0) + self.holiday
+        row.first_checkin_minute = min(
+            (m for m in (row.first_checkin_minute, self.first_checkin_minute) if m is not None),
+            default=None
+        )
+        row.last_checkout_minute = max(
+            (m for m in (row.last_checkout_minute, self.last_checkout_minute) if m is not None),
+            default=None
+        )
+        # JSON columns are not mutation-tracked, so always assign a new dict
+        row.checkin_histogram = dict(Counter(row.checkin_histogram or {}) + self.checkin_histogram)
+        row.checkout_histogram = dict(Counter(row.checkout_histogram or {}) + self.checkout_histogram)
+
+
+def _fold(rows: Iterable, departments: dict) -> dict:
+    """
+    Folds (employee_id, date, status, checkin_time, checkout_time) rows into
+    rollup buckets keyed by (date, department, employee_id).
+    """
+    buckets = {}
+    for employee_id, day, status, checkin_time, checkout_time in rows:
+        department = departments.get(employee_id) or ""
+        for key in ((day, department, employee_id), (day, department, DEPARTMENT_TOTAL)):
+            if key not in buckets:
+                buckets[key] = _Bucket()
+            buckets[key].add(status, checkin_time, checkout_time)
+    return buckets
+
+
+def _department_map(db: Session, employee_ids=None) -> dict:
+    query = db.query(Employee.employee_id, Employee.department)
+    if employee_ids is not None:
+        query = query.filter(Employee.employee_id.in_(employee_ids))
+    return dict(query.all())
+
+
+def apply_attendance_rows(db: Session, rows: Iterable[tuple]):
+    """
+    Adds newly created (employee_id, date, status, checkin_time, checkout_time)
+    rows to the daily rollup.
+
+    Must be called in the same session (and transaction) that inserts the
+    records, before `db.commit()`, so the rollup never drifts from the
+    attendance table.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    departments = _department_map(db, {row[0] for row in rows})
+    buckets = _fold(rows, departments)
+
+    # Create missing rows first, so concurrent writers for the same day and
+    # department serialize on existing rows instead of racing to insert them
+    keys = list(buckets)
+    db.execute(
+        upsert(db, AttendanceDailyRollup, ['date', 'department', 'employee_id']),
+        [
+            {
+                'date': day, 'department': department, 'employee_id': employee_id,
+                'is_weekday': day.weekday() < 5, 'total': 0, 'present': 0, 'leave': 0, 'holiday': 0,
+                'checkin_histogram': {}, 'checkout_histogram': {}
+            }
+            for day, department, employee_id in keys
+        ]
+    )
+
+    # Load the touched rollup rows in one locking query rather than one lookup per key
+    rollup_key = tuple_(AttendanceDailyRollup.date, AttendanceDailyRollup.department, AttendanceDailyRollup.employee_id)
+    for start in range(0, len(keys), 300):  # Three bound parameters per key
+        rollups = db.query(AttendanceDailyRollup).filter(
+            rollup_key.in_(keys[start:start + 300])
+        ).with_for_update().populate_existing()
+        for rollup in rollups:
+            buckets[(rollup.date, rollup.department, rollup.employee_id)].merge_into(rollup)
+    db.flush()
+
+
+def apply_attendances(db: Session, attendances: Iterable[Attendance]):
+    """Adds newly created attendance records to the daily rollup; see `apply_attendance_rows`."""
+    apply_attendance_rows(db, (
+        (a.employee_id, a.date, a.status, a.checkin_time, a.checkout_time)
+        for a in attendances
+    ))
+
+
+def _replace_rollup(db: Session, rollup_filters: tuple, source_filters: tuple) -> int:
+    """Deletes the rollup rows matching `rollup_filters` and folds the matching attendance back in."""
+    db.query(AttendanceDailyRollup).filter(*rollup_filters).delete()
+
+    source_query = db.query(
+        Attendance.employee_id,
+        Attendance.date,
+        Attendance.status,
+        Attendance.checkin_time,
+        Attendance.checkout_time
+    ).filter(*source_filters)
+
+    buckets = _fold(source_query.yield_per(1000), _department_map(db))
+    for (day, department, employee_id), bucket in buckets.items():
+        rollup = AttendanceDailyRollup(
+            date=day,
+            department=department,
+            employee_id=employee_id,
+            is_weekday=day.weekday() < 5
+        )
+        bucket.merge_into(rollup)
+        db.add(rollup)
+    return len(buckets)
+
+
+def refresh_rollup_days(db: Session, days: Iterable[date]):
+    """
+    Recomputes the rollup of whole days within the caller's transaction.
+
+    Used when existing attendance records are changed in place, since
+    first/last minutes cannot be subtracted from a rollup row.
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    _replace_rollup(db, (AttendanceDailyRollup.date.in_(days),), (Attendance.date.in_(days),))
+    db.flush()
+
+
+def rebuild_rollup(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None) -> int:
+    """
+    Recomputes the daily rollup from the attendance table.
+
+    Args:
+        db (Session): Database session.
+        start_date (Optional[date]): First day to rebuild. Defaults to the beginning of history.
+        end_date (Optional[date]): Last day to rebuild. Defaults to the end of history.
+
+    Returns:
+        int: Number of rollup rows written.
+    """
+    rollup_filters = []
+    source_filters = []
+    if start_date:
+        rollup_filters.append(AttendanceDailyRollup.date >= start_date)
+        source_filters.append(Attendance.date >= start_date)
+    if end_date:
+        rollup_filters.append(AttendanceDailyRollup.date <= end_date)
+        source_filters.append(Attendance.date <= end_date)
+
+    written = _replace_rollup(db, tuple(rollup_filters), tuple(source_filters))
+    db.commit()
+    return written
+
+
+def backfill_if_empty(db: Session):
+    """Builds the rollup for databases created before it existed."""
+    if db.query(AttendanceDailyRollup).first() is None and db.query(Attendance).first() is not None:
+        rebuild_rollup(db)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the attendance daily rollup table.")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=None)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        written = rebuild_rollup(db, args.start_date, args.end_date)
+        print(f"Rebuilt attendance rollup: {written} rows")
+    finally:
+        db.close()
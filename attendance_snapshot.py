@@ -0,0 +1,319 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date
+from typing import Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, engine, Base, upsert
+from models import Attendance, AttendanceSnapshotMonth
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; the store then only locks within this process
+    fcntl = None
+
+# Bump when the snapshot layout changes, so files written by older code are re-exported
+SNAPSHOT_FORMAT_VERSION = 1
+EXPORT_CHUNK_ROWS = 5000
+FILE_FORMATS = ("arrow", "parquet")
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+FILE_PREFIX = "attendance-"
+
+SNAPSHOT_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("employee_id", pa.int64()),
+    ("date", pa.date32()),
+    ("checkin_time", pa.timestamp("us")),
+    ("checkout_time", pa.timestamp("us")),
+    ("status", pa.string()),
+    ("is_weekday", pa.bool_())
+])
+
+
+def month_key(day: date) -> str:
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def _month_bounds(month: str) -> tuple:
+    """Returns the first day of `month` and of the month after it."""
+    year, month_number = (int(part) for part in month.split("-"))
+    start = date(year, month_number, 1)
+    end = date(year + 1, 1, 1) if month_number == 12 else date(year, month_number + 1, 1)
+    return start, end
+
+
+def _months_between(first_day: date, last_day: date) -> List[str]:
+    months = []
+    day = first_day.replace(day=1)
+    while day <= last_day:
+        months.append(month_key(day))
+        day = _month_bounds(month_key(day))[1]
+    return months
+
+
+def mark_months_changed(db: Session, days: Iterable[date]):
+    """
+    Bumps the change counter of every month in `days`.
+
+    Must be called in the same transaction that writes the attendance
+    records, so the next snapshot refresh sees the write and the new counter
+    together.
+    """
+    months = sorted({month_key(day) for day in days})
+    if not months:
+        return
+
+    db.execute(
+        upsert(db, AttendanceSnapshotMonth, ['month'], update=lambda _: {'version': AttendanceSnapshotMonth.version + 1}),
+        [{'month': month, 'version': 1} for month in months]
+    )
+
+
+class AttendanceSnapshotStore:
+    """
+    Attendance exported to one columnar file per month, for analytics that
+    read whole histories.
+
+    A manifest records the change counter each month file was exported at;
+    `refresh` rewrites only the months whose counter moved since, which for
+    normal traffic is the current month. Refreshes are serialized across
+    threads and processes by a lock file in the directory, which loads take
+    shared. Arrow files are uncompressed IPC and are memory-mapped on load,
+    so reading a year of history costs a few file opens instead of a table
+    scan through the database driver. Parquet
+    files are compressed and decoded on load, for use outside this service.
+
+    Args:
+        directory (str): Where the month files and the manifest are written.
+        file_format (str): "arrow" or "parquet".
+    """
+
+    def __init__(self, directory: str, file_format: str = "arrow"):
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"Unknown snapshot format '{file_format}'. Choose one of: {', '.join(FILE_FORMATS)}")
+        self.directory = directory
+        self.file_format = file_format
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_manifest(self) -> dict:
+        """Returns {month: {"version", "rows", "file"}}; empty if missing or written in another layout."""
+        path = self._path(MANIFEST_NAME)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != SNAPSHOT_FORMAT_VERSION or manifest.get("file_format") != self.file_format:
+            return {}
+        return manifest["months"]
+
+    def _tmp_path(self, name: str) -> str:
+        """A new, unique file next to `name` to write it to before renaming it into place."""
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix=f"{name}.", suffix=".tmp")
+        os.close(fd)
+        os.chmod(path, 0o644)  # mkstemp makes the file private, but snapshots are read outside this service
+        return path
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """
+        Holds the lock file of the directory, shared with other processes:
+        exclusively to refresh, shared to load, so a load never opens files
+        a refresh is replacing. Refreshes also hold the lock of this process,
+        which serializes everything when fcntl is unavailable.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if fcntl is None:
+            with self._lock:
+                yield
+            return
+        with self._lock if exclusive else nullcontext():
+            with open(self._path(LOCK_NAME), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_manifest(self, months: dict):
+        tmp_path = self._tmp_path(MANIFEST_NAME)
+        with open(tmp_path, "w") as f:
+            json.dump({"version": SNAPSHOT_FORMAT_VERSION, "file_format": self.file_format, "months": months}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._path(MANIFEST_NAME))  # Atomic, so readers never see a partial file
+
+    def _writer(self, path: str):
+        if self.file_format == "parquet":
+            return pq.ParquetWriter(path, SNAPSHOT_SCHEMA)
+        return pa.ipc.new_file(path, SNAPSHOT_SCHEMA)
+
+    def _export_month(self, db: Session, month: str, version: int) -> dict:
+        start, end = _month_bounds(month)
+        result = db.execute(
+            select(*(getattr(Attendance, name) for name in SNAPSHOT_SCHEMA.names))
+            .where(Attendance.date >= start, Attendance.date < end)
+            .order_by(Attendance.id)
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+
+        name = f"{FILE_PREFIX}{month}.{self.file_format}"
+        tmp_path = self._tmp_path(name)
+        rows = 0
+        with self._writer(tmp_path) as writer:
+            for chunk in result.partitions():
+                writer.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), SNAPSHOT_SCHEMA)],
+                    schema=SNAPSHOT_SCHEMA
+                ))
+                rows += len(chunk)
+
+        if not rows:
+            os.remove(tmp_path)
+            name = None
+        else:
+            os.replace(tmp_path, self._path(name))
+        return {"version": version, "rows": rows, "file": name}
+
+    def _remove_unreferenced(self, months: dict):
+        """Removes month files the manifest no longer lists, and temp files left by interrupted refreshes."""
+        referenced = {entry["file"] for entry in months.values()}
+        for name in os.listdir(self.directory):
+            if (name.startswith(FILE_PREFIX) or name.endswith(".tmp")) and name not in referenced:
+                os.remove(self._path(name))
+
+    def refresh(self, db: Session, full: bool = False) -> List[str]:
+        """
+        Exports the months that changed since the last refresh.
+
+        Counters are read before the records, so a write committed during
+        the export is at worst exported again next time, never missed.
+
+        Args:
+            db (Session): Database session.
+            full (bool): Rewrite every month, e.g. after records were written
+                         without `mark_months_changed`.
+
+        Returns:
+            List[str]: The months ("YYYY-MM") that were exported.
+        """
+        with self._locked(exclusive=True):
+            months = self._read_manifest()
+            versions = dict(db.query(AttendanceSnapshotMonth.month, AttendanceSnapshotMonth.version).all())
+            # Separate queries, so each is a single index lookup rather than a scan
+            first_day = db.query(func.min(Attendance.date)).scalar()
+            last_day = db.query(func.max(Attendance.date)).scalar()
+
+            candidates = set(versions)
+            if first_day is not None:
+                candidates.update(_months_between(first_day, last_day))
+            stale = sorted(
+                month for month in candidates
+                if full or month not in months or months[month]["version"] != versions.get(month, 0)
+            )
+            if not stale:
+                return []
+
+            for month in stale:
+                months[month] = self._export_month(db, month, versions.get(month, 0))
+            self._write_manifest(months)
+            self._remove_unreferenced(months)
+            return stale
+
+    def _open(self, name: str) -> pa.Table:
+        if self.file_format == "parquet":
+            return pq.read_table(self._path(name), memory_map=True)
+        # Zero-copy: the table's buffers point into the mapping, which stays open while they are referenced
+        return pa.ipc.open_file(pa.memory_map(self._path(name))).read_all()
+
+    def load(self, columns: List[str], employee_ids: Optional[Iterable[int]] = None, statuses: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Reads the snapshot as of the last refresh; see `load_attendance`."""
+        selected = list(dict.fromkeys(["id", "employee_id", "status", *columns]))
+        # Opened files stay readable once the lock is released, even if a refresh then replaces them
+        with self._locked(exclusive=False):
+            tables = [
+                self._open(entry["file"]).select(selected)
+                for _, entry in sorted(self._read_manifest().items()) if entry["file"]
+            ]
+        table = pa.concat_tables(tables) if tables else SNAPSHOT_SCHEMA.empty_table().select(selected)
+
+        if employee_ids is not None:
+            table = table.filter(pc.is_in(table["employee_id"], value_set=pa.array(list(employee_ids), pa.int64())))
+        if statuses is not None:
+            table = table.filter(pc.is_in(table["status"], value_set=pa.array(list(statuses), pa.string())))
+        return table.sort_by("id").select(columns).to_pandas()
+
+
+def _query_attendance(db: Session, columns: List[str], employee_ids: Optional[Iterable[int]], statuses: Optional[Iterable[str]]) -> pd.DataFrame:
+    query = db.query(*(getattr(Attendance, column) for column in columns))
+    if employee_ids is not None:
+        query = query.filter(Attendance.employee_id.in_(list(employee_ids)))
+    if statuses is not None:
+        query = query.filter(Attendance.status.in_(list(statuses)))
+    return pd.read_sql(query.order_by(Attendance.id).statement, db.bind)
+
+
+def load_attendance(
+    db: Session,
+    columns: List[str],
+    employee_ids: Optional[Iterable[int]] = None,
+    statuses: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """
+    Loads attendance records for analytics, ordered by id.
+
+    With ATTENDANCE_SNAPSHOT_ENABLED the changed months are exported first
+    and the rest is read from the snapshot files; otherwise the records are
+    queried from the database.
+
+    Args:
+        db (Session): Database session.
+        columns (List[str]): Attendance columns to return.
+        employee_ids (Optional[Iterable[int]]): Only these employees. Defaults to everyone.
+        statuses (Optional[Iterable[str]]): Only records with these statuses.
+
+    Returns:
+        pd.DataFrame: One row per attendance record with the requested columns.
+    """
+    if not settings.ATTENDANCE_SNAPSHOT_ENABLED:
+        return _query_attendance(db, columns, employee_ids, statuses)
+    attendance_snapshots.refresh(db)
+    return attendance_snapshots.load(columns, employee_ids, statuses)
+
+
+attendance_snapshots = AttendanceSnapshotStore(
+    directory=settings.ATTENDANCE_SNAPSHOT_DIR,
+    file_format=settings.ATTENDANCE_SNAPSHOT_FORMAT
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export attendance to monthly Arrow or Parquet files.")
+    parser.add_argument("--format", choices=FILE_FORMATS, default=settings.ATTENDANCE_SNAPSHOT_FORMAT, help="File format (default: ATTENDANCE_SNAPSHOT_FORMAT)")
+    parser.add_argument("--directory", default=None, help="Output directory (default: ATTENDANCE_SNAPSHOT_DIR)")
+    parser.add_argument("--full", action="store_true", help="Rewrite every month, not only the changed ones")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    store = AttendanceSnapshotStore(args.directory or settings.ATTENDANCE_SNAPSHOT_DIR, args.format)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        exported = store.refresh(db, full=args.full)
+        print(f"Exported {len(exported)} month(s) to {store.directory} in {time.perf_counter() - started:.1f}s"
+              + (f": {', '.join(exported)}" if exported else ""))
+    finally:
+        db.close()
@@ -0,0 +1,256 @@
+from collections import defaultdict
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import Integer, cast, func, true
+from sqlalchemy.orm import Session
+
+from models import Employee, AttendanceDailyRollup
+from holiday_calendar import holiday_calendar
+from config import settings
+
+DEPARTMENT_TOTAL = AttendanceDailyRollup.DEPARTMENT_TOTAL
+
+
+def _percentage(present: int, total: int) -> float:
+    return round((present / total * 100), 2) if total > 0 else 0
+
+
+def _period_column(db: Session, start_date: date, end_date: date):
+    """
+    Returns the SQL expression used to bucket rollup rows for the attendance
+    trend: "YYYY-MM" for ranges longer than 30 days, otherwise "YYYY-MM-DD".
+    """
+    monthly = (end_date - start_date).days > 30
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(AttendanceDailyRollup.date, 'YYYY-MM' if monthly else 'YYYY-MM-DD')
+    return func.strftime('%Y-%m' if monthly else '%Y-%m-%d', AttendanceDailyRollup.date)
+
+
+def _format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def _parse_minute(value: str) -> int:
+    """Converts "HH:MM" to minutes since midnight."""
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _working_total():
+    """Records minus holiday records, so a holiday record never counts as an absence, even on dates the calendar misses."""
+    return func.sum(AttendanceDailyRollup.total - AttendanceDailyRollup.holiday)
+
+
+def _working_day_filters(start_date: date, end_date: date) -> tuple:
+    """Rollup filters for weekdays in the range that are not holidays, so holidays never count as absences."""
+    return (
+        AttendanceDailyRollup.date.between(start_date, end_date),
+        AttendanceDailyRollup.is_weekday.is_(True),
+        AttendanceDailyRollup.date.notin_(holiday_calendar.holiday_dates(start_date, end_date))
+    )
+
+
+def fetch_department_groups(db: Session, start_date: date, end_date: date):
+    """
+    Reads the department-wide rollup rows for the requested range, grouped by
+    (trend period, department). Overall, per-department and trend statistics
+    are all folded from this one result set.
+
+    Returns:
+        list: Tuples of (period, department, total, present), where total
+              excludes holiday records.
+    """
+    period = _period_column(db, start_date, end_date).label('period')
+    return db.query(
+        period,
+        AttendanceDailyRollup.department,
+        _working_total(),
+        func.sum(AttendanceDailyRollup.present)
+    ).filter(
+        AttendanceDailyRollup.employee_id == DEPARTMENT_TOTAL,
+        *_working_day_filters(start_date, end_date)
+    ).group_by(period, AttendanceDailyRollup.department).all()
+
+
+def fetch_minute_histogram(
+    db: Session,
+    histogram_column,
+    start_date: date,
+    end_date: date,
+    first_minute: int,
+    last_minute: int,
+    bucket_minutes: int
+) -> dict:
+    """
+    Buckets the department-wide check-in or check-out minutes of working days
+    in the range, entirely in SQL: the rollup's {"minute of day": count}
+    histograms are expanded with json_each and grouped by
+    (minute - first_minute) / bucket_minutes.
+
+    Args:
+        db (Session): Database session.
+        histogram_column: AttendanceDailyRollup.checkin_histogram or .checkout_histogram.
+        start_date (date): First day of the range (inclusive).
+        end_date (date): Last day of the range (inclusive).
+        first_minute (int): Start of the first bucket, minutes since midnight.
+        last_minute (int): Last minute counted (inclusive).
+        bucket_minutes (int): Bucket width in minutes.
+
+    Returns:
+        dict: {"HH:MM" bucket start: count} for every bucket in the range, including empty ones.
+    """
+    # PostgreSQL stores the histograms as json, whose text expansion is json_each_text
+    json_each = func.json_each_text if db.get_bind().dialect.name == "postgresql" else func.json_each
+    entries = json_each(histogram_column).table_valued("key", "value")
+    minute = cast(entries.c.key, Integer)
+    bucket = ((minute - first_minute) // bucket_minutes).label('bucket')
+
+    counts = dict(db.query(
+        bucket,
+        func.sum(cast(entries.c.value, Integer))
+    ).select_from(AttendanceDailyRollup).join(
+        entries, true()  # Each row joins its own histogram entries
+    ).filter(
+        AttendanceDailyRollup.employee_id == DEPARTMENT_TOTAL,
+        *_working_day_filters(start_date, end_date),
+        minute.between(first_minute, last_minute)
+    ).group_by(bucket).all())
+
+    return {
+        _format_minute(first_minute + index * bucket_minutes): counts.get(index, 0)
+        for index in range((last_minute - first_minute) // bucket_minutes + 1)
+    }
+
+
+def fetch_top_performers(db: Session, start_date: date, end_date: date, limit: int = 5):
+    total = _working_total()
+    present = func.sum(AttendanceDailyRollup.present)
+
+    return db.query(
+        Employee.employee_name,
+        total.label('total_days'),
+        present.label('present_days')
+    ).join(
+        Employee, Employee.employee_id == AttendanceDailyRollup.employee_id
+    ).filter(
+        AttendanceDailyRollup.employee_id != DEPARTMENT_TOTAL,
+        *_working_day_filters(start_date, end_date)
+    ).group_by(
+        AttendanceDailyRollup.employee_id
+    ).having(
+        total > 0
+    ).order_by(
+        (present * 1.0 / total).desc(),
+        AttendanceDailyRollup.employee_id
+    ).limit(limit).all()
+
+
+def fetch_early_comers(db: Session, target_date: date, limit: int = 5):
+    return db.query(
+        Employee.employee_name,
+        AttendanceDailyRollup.first_checkin_minute
+    ).join(
+        Employee, Employee.employee_id == AttendanceDailyRollup.employee_id
+    ).filter(
+        AttendanceDailyRollup.employee_id != DEPARTMENT_TOTAL,
+        AttendanceDailyRollup.date == target_date,
+        AttendanceDailyRollup.first_checkin_minute.isnot(None)
+    ).order_by(
+        AttendanceDailyRollup.first_checkin_minute,
+        AttendanceDailyRollup.employee_id
+    ).limit(limit).all()
+
+
+def compute_attendance_stats(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    target_date: Optional[date] = None,
+    bucket_minutes: Optional[int] = None
+) -> dict:
+    """
+    Computes overall, per-department, trend and top-N attendance statistics
+    from the attendance daily rollup.
+
+    Args:
+        db (Session): Database session.
+        start_date (date): First day of the range (inclusive).
+        end_date (date): Last day of the range (inclusive).
+        target_date (Optional[date]): Set for single-day dashboards, which
+                                      show check-in/check-out trends and early comers.
+        bucket_minutes (Optional[int]): Trend bucket width. Defaults to TREND_BUCKET_MINUTES.
+
+    Returns:
+        dict: The `/attendance-stats` response body.
+    """
+    groups = fetch_department_groups(db, start_date, end_date)
+
+    total_records = 0
+    present_records = 0
+    dept_totals = defaultdict(lambda: [0, 0])
+    period_totals = defaultdict(lambda: [0, 0])
+
+    for period, department, total, present in groups:
+        total_records += total
+        present_records += present
+        dept_totals[department][0] += total
+        dept_totals[department][1] += present
+        period_totals[period][0] += total
+        period_totals[period][1] += present
+
+    if target_date:
+        bucket_minutes = bucket_minutes or settings.TREND_BUCKET_MINUTES
+        trend_data = fetch_minute_histogram(
+            db, AttendanceDailyRollup.checkin_histogram, target_date, target_date,
+            _parse_minute(settings.CHECKIN_TREND_START), _parse_minute(settings.CHECKIN_TREND_END), bucket_minutes
+        )
+        checkout_trend_data = fetch_minute_histogram(
+            db, AttendanceDailyRollup.checkout_histogram, target_date, target_date,
+            _parse_minute(settings.CHECKOUT_TREND_START), _parse_minute(settings.CHECKOUT_TREND_END), bucket_minutes
+        )
+        early_comers_data = [
+            {
+                "name": name,
+                "check_in_time": _format_minute(minute)
+            }
+            for name, minute in fetch_early_comers(db, target_date)
+        ]
+        top_performers_data = []
+    else:
+        trend_data = {
+            period: _percentage(present, total)
+            for period, (total, present) in sorted(period_totals.items())
+        }
+        checkout_trend_data = {}
+        top_performers_data = [
+            {
+                "name": name,
+                "percentage": _percentage(present_days, total_days)
+            }
+            for name, total_days, present_days in fetch_top_performers(db, start_date, end_date)
+        ]
+        early_comers_data = []
+
+    absent_records = total_records - present_records
+
+    return {
+        "overall_stats": {
+            "percentage": _percentage(present_records, total_records),
+            "present": f"{present_records}/{total_records}",
+            "absent": f"{absent_records}/{total_records}"
+        },
+        "department_stats": {
+            dept: _percentage(present, total)
+            for dept, (total, present) in dept_totals.items()
+        },
+        "attendance_trend": trend_data,
+        "checkout_trend": checkout_trend_data,  # Check-out histogram for single date
+        "early_comers": early_comers_data,  # Return early comers for single date
+        "top_performers": top_performers_data,  # Return top performers for date range
+        "date_info": {
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "is_single_date": target_date is not None
+        }
+    }
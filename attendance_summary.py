@@ -0,0 +1,199 @@
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine, Base, upsert
+from models import Attendance, EmployeeAttendanceSummary
+
+LOOKUP_CHUNK_SIZE = 500
+
+
+class _Counters:
+    """In-memory accumulator for one employee's summary row."""
+
+    def __init__(self, summary: Optional[EmployeeAttendanceSummary] = None):
+        self.total = summary.total if summary else 0
+        self.present = summary.present if summary else 0
+        self.leave = summary.leave if summary else 0
+        self.holiday = summary.holiday if summary else 0
+        self.last_date = summary.last_date if summary else None
+        self.last_checkin_time = summary.last_checkin_time if summary else None
+        self.current_present_streak = summary.current_present_streak if summary else 0
+        self.longest_present_streak = summary.longest_present_streak if summary else 0
+
+    def add(self, day, status: str, checkin_time: Optional[datetime]):
+        """Folds in one record; records must arrive in date order."""
+        self.total += 1
+        if status == 'present':
+            self.present += 1
+            self.current_present_streak += 1
+            self.longest_present_streak = max(self.longest_present_streak, self.current_present_streak)
+        elif status == 'holiday':
+            self.holiday += 1
+        else:
+            if status == 'leave':
+                self.leave += 1
+            self.current_present_streak = 0
+
+        if checkin_time is not None and (self.last_checkin_time is None or checkin_time > self.last_checkin_time):
+            self.last_checkin_time = checkin_time
+        if self.last_date is None or day > self.last_date:
+            self.last_date = day
+
+    def values(self) -> dict:
+        return {
+            'total': self.total,
+            'present': self.present,
+            'leave': self.leave,
+            'holiday': self.holiday,
+            'last_date': self.last_date,
+            'last_checkin_time': self.last_checkin_time,
+            'current_present_streak': self.current_present_streak,
+            'longest_present_streak': self.longest_present_streak
+        }
+
+
+def _chunks(values: list, size: int = LOOKUP_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def apply_summary_rows(db: Session, rows: Iterable[tuple]):
+    """
+    Folds newly created (employee_id, date, status, checkin_time, checkout_time)
+    rows into the employees' summaries.
+
+    Must be called in the same session (and transaction) that inserts the
+    records, after they are flushed and before `db.commit()`. Records dated
+    after an employee's latest attendance are added to the counters; any
+    other record can change a streak in the middle of the history, so that
+    employee's summary is recomputed instead.
+    """
+    by_employee = defaultdict(list)
+    for employee_id, day, status, checkin_time, _ in rows:
+        by_employee[employee_id].append((day, status, checkin_time))
+    if not by_employee:
+        return
+
+    # Create missing rows first, so concurrent writers for the same employee
+    # serialize on the existing row instead of racing to insert it
+    employee_ids = sorted(by_employee)
+    db.execute(
+        upsert(db, EmployeeAttendanceSummary, ['employee_id']),
+        [
+            {'employee_id': employee_id, 'total': 0, 'present': 0, 'leave': 0, 'holiday': 0,
+             'current_present_streak': 0, 'longest_present_streak': 0}
+            for employee_id in employee_ids
+        ]
+    )
+
+    out_of_order = []
+    for chunk in _chunks(employee_ids):
+        summaries = db.query(EmployeeAttendanceSummary).filter(
+            EmployeeAttendanceSummary.employee_id.in_(chunk)
+        ).with_for_update().populate_existing()
+        for summary in summaries:
+            records = sorted(by_employee[summary.employee_id], key=lambda record: record[0])
+            if summary.last_date is not None and records[0][0] <= summary.last_date:
+                out_of_order.append(summary.employee_id)
+                continue
+            counters = _Counters(summary)
+            for day, status, checkin_time in records:
+                counters.add(day, status, checkin_time)
+            for column, value in counters.values().items():
+                setattr(summary, column, value)
+    db.flush()
+
+    refresh_summaries(db, out_of_order)
+
+
+def apply_attendance_summaries(db: Session, attendances: Iterable[Attendance]):
+    """Adds newly created attendance records to the employee summaries; see `apply_summary_rows`."""
+    apply_summary_rows(db, (
+        (a.employee_id, a.date, a.status, a.checkin_time, a.checkout_time)
+        for a in attendances
+    ))
+
+
+def _replace_summaries(db: Session, employee_ids: Optional[List[int]] = None) -> int:
+    """Deletes the summaries of `employee_ids` (None: everyone) and recomputes them from attendance."""
+    summaries = db.query(EmployeeAttendanceSummary)
+    source_query = db.query(
+        Attendance.employee_id,
+        Attendance.date,
+        Attendance.status,
+        Attendance.checkin_time
+    )
+    if employee_ids is not None:
+        summaries = summaries.filter(EmployeeAttendanceSummary.employee_id.in_(employee_ids))
+        source_query = source_query.filter(Attendance.employee_id.in_(employee_ids))
+    summaries.delete(synchronize_session=False)
+
+    counters = defaultdict(_Counters)
+    for employee_id, day, status, checkin_time in source_query.order_by(
+        Attendance.employee_id, Attendance.date, Attendance.id
+    ).yield_per(1000):
+        counters[employee_id].add(day, status, checkin_time)
+
+    if counters:
+        db.execute(insert(EmployeeAttendanceSummary), [
+            {'employee_id': employee_id, **employee_counters.values()}
+            for employee_id, employee_counters in counters.items()
+        ])
+    return len(counters)
+
+
+def refresh_summaries(db: Session, employee_ids: Iterable[int]):
+    """
+    Recomputes the summaries of some employees within the caller's transaction.
+
+    Used when existing attendance records are changed in place, or records
+    are added before an employee's latest date.
+    """
+    employee_ids = sorted(set(employee_ids))
+    for chunk in _chunks(employee_ids):
+        _replace_summaries(db, chunk)
+    db.flush()
+
+
+def rebuild_summaries(db: Session, employee_ids: Optional[List[int]] = None) -> int:
+    """
+    Recomputes employee attendance summaries from the attendance table.
+
+    Args:
+        db (Session): Database session.
+        employee_ids (Optional[List[int]]): Employees to repair. Defaults to everyone.
+
+    Returns:
+        int: Number of summary rows written.
+    """
+    if employee_ids is None:
+        written = _replace_summaries(db)
+    else:
+        written = sum(_replace_summaries(db, chunk) for chunk in _chunks(sorted(set(employee_ids))))
+    db.commit()
+    return written
+
+
+def backfill_if_empty(db: Session):
+    """Builds the summaries for databases created before they existed."""
+    if db.query(EmployeeAttendanceSummary).first() is None and db.query(Attendance).first() is not None:
+        rebuild_summaries(db)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the employee attendance summary table.")
+    parser.add_argument("--employee-id", type=int, nargs="*", default=None, help="Only repair these employees")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        written = rebuild_summaries(db, args.employee_id)
+        print(f"Rebuilt employee attendance summaries: {written} rows")
+    finally:
+        db.close()
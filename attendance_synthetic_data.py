@@ -4,7 +4,10 @@ from models import Employee, Attendance
 from datetime import datetime, date, timedelta
 import random
 from typing import List
-import holidays
+from holiday_calendar import holiday_calendar
+from attendance_rollup import apply_attendances
+from attendance_summary import apply_attendance_summaries
+from attendance_snapshot import mark_months_changed
 from tqdm import tqdm
 
 def generate_random_time(start_hour: int, end_hour: int) -> datetime:
@@ -25,16 +28,19 @@ def generate_attendance_data():
         start_date = date(2024, 1, 1)
         end_date = date(2024, 12, 31)
         
-        # Get Indian holidays
-        in_holidays = holidays.India(years=2024)
+        # Get country holidays from the shared calendar
+        country_holidays = holiday_calendar.holiday_dates(start_date, end_date)
         
-        # Select 11 random holidays from working days
+        # Select 11 random holidays from working days and store them as company holidays
         potential_holidays = [
             day for day in (start_date + timedelta(n) for n in range((end_date - start_date).days + 1))
-            if day.weekday() < 5 and day not in in_holidays
+            if day.weekday() < 5 and day not in country_holidays
         ]
         custom_holidays = set(random.sample(potential_holidays, 11))
-        all_holidays = custom_holidays.union(set(in_holidays))
+        holiday_calendar.add_company_holidays(
+            db, {day: "Company Holiday" for day in custom_holidays}
+        )
+        all_holidays = holiday_calendar.holiday_dates(start_date, end_date)
 
         # Calculate total number of days for progress bar
         total_days = (end_date - start_date).days + 1
@@ -49,6 +55,7 @@ def generate_attendance_data():
             if current_date.weekday() >= 5:
                 continue
 
+            day_records = []
             for employee in employees:
                 # Randomly decide if employee is on leave (5% chance)
                 is_leave = random.random() < 0.05
@@ -81,6 +88,13 @@ def generate_attendance_data():
                     status=status
                 )
                 db.add(attendance)
+                day_records.append(attendance)
+
+            # Keep the rollup, summaries and snapshot counters in step, as the API does
+            apply_attendances(db, day_records)
+            db.flush()
+            apply_attendance_summaries(db, day_records)
+            mark_months_changed(db, [current_date])
 
             # Commit every day's records
             db.commit()
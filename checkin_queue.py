@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from attendance_ingest import ingest_attendance
+from config import settings
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when a check-in cannot be queued within the enqueue timeout."""
+
+
+class CheckinQueue:
+    """
+    Write-behind buffer for check-ins.
+
+    Check-ins are accepted into a bounded asyncio queue and written by a
+    single flusher task in micro-batches: a batch is closed when it reaches
+    `batch_size` records or `batch_window` seconds after its first record,
+    and is upserted in one transaction with `ingest_attendance`. Callers
+    either return as soon as the record is queued ("buffered") or await the
+    commit of its batch ("confirmed"), after which reads see the row.
+
+    Args:
+        max_size (int): Queue capacity; beyond it enqueueing waits (back-pressure).
+        batch_size (int): Most records written per transaction.
+        batch_window (float): Seconds to wait for more records once a batch has started.
+        enqueue_timeout (float): Seconds an enqueue may wait for room before QueueFull.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, batch_window: float, enqueue_timeout: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = None
+        self._flusher = None
+        self._accepting = False
+        self._enqueuing = 0  # submit() calls waiting for room in the queue
+        self._enqueued = None  # Notified whenever one of them finishes
+
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_seconds = None
+        self.max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    def start(self):
+        """Starts the flusher task on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._enqueued = asyncio.Condition()
+        self._accepting = True
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops accepting check-ins and flushes everything already queued."""
+        if not self.running:
+            return
+        self._accepting = False
+        # Check-ins already waiting for room go in ahead of the sentinel, so none is left behind it
+        async with self._enqueued:
+            await self._enqueued.wait_for(lambda: not self._enqueuing)
+        await self._queue.put(None)  # Sentinel: the flusher drains up to it and exits
+        await self._flusher
+        self._flusher = None
+
+    async def submit(self, record: dict, wait: bool) -> Optional[dict]:
+        """
+        Queues one check-in.
+
+        Args:
+            record (dict): Raw attendance record, validated when its batch is written.
+            wait (bool): Await the commit of the record's batch.
+
+        Returns:
+            Optional[dict]: With `wait`, the record's outcome: {"result": "inserted",
+                            "updated" or "unchanged"} or {"result": "rejected", "error": ...}.
+
+        Raises:
+            QueueFull: If the queue stayed full for `enqueue_timeout` seconds.
+            RuntimeError: If the queue is not running or stopping, or the batch failed to commit.
+        """
+        if not self.running or not self._accepting:
+            raise RuntimeError("Check-in queue is not running")
+
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self._enqueuing += 1
+        try:
+            await asyncio.wait_for(self._queue.put((record, future)), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueFull(f"Check-in queue is full ({self.max_size} pending)")
+        finally:
+            async with self._enqueued:
+                self._enqueuing -= 1
+                self._enqueued.notify_all()
+        self.enqueued += 1
+
+        return await future if wait else None
+
+    async def _next_batch(self) -> Tuple[List[tuple], bool]:
+        """Waits for a first item, then collects more until the batch is full or its window ends."""
+        batch = []
+        item = await self._queue.get()
+        if item is None:
+            return batch, True
+        batch.append(item)
+
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[tuple]):
+        # A later check-in for the same employee and day supersedes an earlier one in the batch
+        latest = {}
+        for position, (record, _) in enumerate(batch):
+            latest[(record["employee_id"], record["date"])] = position
+        positions = sorted(latest.values())
+        rows = [batch[position][0] for position in positions]
+
+        started = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(_write_batch, rows)
+        except Exception as e:
+            logger.exception("Error flushing %d queued check-ins", len(rows))
+            self.failed += len(batch)
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(RuntimeError(f"Check-in was not saved: {e}"))
+            return
+        finally:
+            elapsed = time.perf_counter() - started
+            self.batches += 1
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self._total_flush_seconds += elapsed
+
+        errors = {error["row"]: error["error"] for error in result["errors"]}
+        outcomes = {
+            position: {"result": "rejected", "error": errors[row]} if row in errors
+            else {"result": result["outcomes"][row]}
+            for row, position in enumerate(positions)
+        }
+        self.flushed += len(rows) - len(errors)
+        self.failed += len(errors)
+
+        for record, future in batch:
+            if future is not None and not future.done():
+                future.set_result(outcomes[latest[(record["employee_id"], record["date"])]])
+
+    def metrics(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_seconds": self.last_flush_seconds,
+            "avg_flush_seconds": self._total_flush_seconds / self.batches if self.batches else None,
+            "max_flush_seconds": self.max_flush_seconds
+        }
+
+
+def _write_batch(rows: List[dict]) -> dict:
+    db = SessionLocal()
+    try:
+        return ingest_attendance(db, rows)
+    finally:
+        db.close()
+
+
+checkin_queue = CheckinQueue(
+    max_size=settings.CHECKIN_QUEUE_MAX_SIZE,
+    batch_size=settings.CHECKIN_BATCH_SIZE,
+    batch_window=settings.CHECKIN_BATCH_WINDOW_MS / 1000,
+    enqueue_timeout=settings.CHECKIN_ENQUEUE_TIMEOUT_SECONDS
+)
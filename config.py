@@ -1,6 +1,47 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./employee_attendance.db"
+    ANOMALY_MODEL_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    ANOMALY_N_JOBS: int = 1  # Worker processes for anomaly model fitting; -1 uses every core
+    ANOMALY_SCORING_INTERVAL_SECONDS: int = 300  # Background rescoring period; 0 disables the job
+    PROPHET_MODEL_DIR: str = "./prophet_models"
+    PROPHET_MODEL_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    PROPHET_TRAINING_WORKERS: Optional[int] = None  # Defaults to the number of CPUs
+    PREDICTION_FORECASTER: str = "prophet"  # "prophet" or the fast "baseline"
+    HOLIDAY_COUNTRY: str = "IN"  # Country code passed to holidays.country_holidays
+    CHECKIN_QUEUE_MAX_SIZE: int = 10000  # Queued check-ins before callers wait (back-pressure)
+    CHECKIN_BATCH_SIZE: int = 500  # Most check-ins written per transaction
+    CHECKIN_BATCH_WINDOW_MS: int = 50  # How long a started batch waits for more check-ins
+    CHECKIN_ENQUEUE_TIMEOUT_SECONDS: float = 2.0  # Wait for queue room before answering 503
+    CHECKIN_DURABILITY: str = "confirmed"  # "confirmed" waits for the commit, "buffered" returns once queued
+    SQLITE_TUNING_ENABLED: bool = True  # Apply the SQLITE_* pragmas below on every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"  # Readers no longer block the writer, and vice versa
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Safe with WAL; only the last commits can be lost on power failure
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # Page cache per connection
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_JOURNAL_SIZE_LIMIT: int = 64 * 1024 * 1024  # WAL file is truncated to this after checkpoints
+    SQLITE_MAINTENANCE_INTERVAL_SECONDS: int = 3600  # PRAGMA optimize + WAL checkpoint period; 0 disables
+    DB_POOL_SIZE: int = 5  # Connections kept open per engine (server databases)
+    DB_MAX_OVERFLOW: int = 10  # Extra connections opened under load and closed when returned
+    DB_POOL_TIMEOUT_SECONDS: float = 30  # Wait for a free connection before raising
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # Reconnect connections older than this; -1 disables
+    DB_POOL_PRE_PING: bool = True  # Test connections on checkout and replace dropped ones
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # Server-side statement timeout (PostgreSQL, MySQL); 0 disables
+    RESPONSE_CACHE_ENABLED: bool = True  # Cache /attendance-stats, /employees/ and /analytics/anomalies responses
+    RESPONSE_CACHE_BACKEND: str = "memory"  # Name registered in response_cache.CACHE_BACKENDS
+    RESPONSE_CACHE_TTL_SECONDS: float = 60  # Bounds staleness from writes made by other processes
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024  # Least recently used responses are evicted beyond this
+    TREND_BUCKET_MINUTES: int = 5  # Width of the single-date check-in/check-out trend buckets
+    CHECKIN_TREND_START: str = "08:00"  # First check-in trend bucket ("HH:MM")
+    CHECKIN_TREND_END: str = "10:00"  # Last minute counted in the check-in trend
+    CHECKOUT_TREND_START: str = "13:00"
+    CHECKOUT_TREND_END: str = "20:00"
+    ATTENDANCE_SNAPSHOT_ENABLED: bool = True  # Anomaly models and the baseline forecaster read monthly snapshot files instead of SQL
+    ATTENDANCE_SNAPSHOT_DIR: str = "./attendance_snapshots"
+    ATTENDANCE_SNAPSHOT_FORMAT: str = "arrow"  # "arrow" (uncompressed, memory-mapped) or "parquet" (compressed)
     
 settings = Settings()
\ No newline at end of file
@@ -1,18 +1,192 @@
-from sqlalchemy import create_engine
+import asyncio
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from config import settings
+from pool_metrics import PoolMetrics, metered_pool_class
+
+logger = logging.getLogger(__name__)
+
+# Async drivers selectable in DATABASE_URL, and the sync dialect used alongside them
+ASYNC_DRIVERS = {"aiosqlite": "sqlite", "asyncpg": "postgresql"}
+
+database_url = make_url(settings.DATABASE_URL)
+async_enabled = database_url.get_driver_name() in ASYNC_DRIVERS
+
+# Scripts, background jobs and most routers keep using the sync engine, even when the URL names an async driver
+sync_url = database_url.set(drivername=database_url.get_backend_name()) if async_enabled else database_url
+is_sqlite = sync_url.get_backend_name() == "sqlite"
+
+
+def engine_options(url, metrics: PoolMetrics) -> dict:
+    """
+    Keyword arguments for create_engine/create_async_engine: pool sizing and
+    statement timeout for server databases, thread sharing for SQLite, and a
+    pool class that reports to `metrics`.
+    """
+    backend, driver = url.get_backend_name(), url.get_driver_name()
+    connect_args = {}
+    options = {}
+
+    if backend == "sqlite":
+        if driver == "pysqlite":
+            connect_args["check_same_thread"] = False
+    else:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=settings.DB_POOL_PRE_PING
+        )
+        timeout = settings.DB_STATEMENT_TIMEOUT_MS
+        if timeout > 0:
+            if driver == "asyncpg":
+                connect_args["server_settings"] = {"statement_timeout": str(timeout)}
+            elif backend == "postgresql":
+                connect_args["options"] = f"-c statement_timeout={timeout}"
+            elif backend in ("mysql", "mariadb"):
+                connect_args["init_command"] = f"SET SESSION max_execution_time={timeout}"
+            else:
+                logger.warning("DB_STATEMENT_TIMEOUT_MS is not supported for %s; ignoring it", backend)
+
+    options["poolclass"] = metered_pool_class(url.get_dialect().get_pool_class(url), metrics)
+    options["connect_args"] = connect_args
+    return options
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+pool_metrics = [PoolMetrics("sync")]
+engine = create_engine(sync_url, **engine_options(sync_url, pool_metrics[0]))
+pool_metrics[0].attach(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if async_enabled:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    pool_metrics.append(PoolMetrics("async"))
+    async_engine = create_async_engine(database_url, **engine_options(database_url, pool_metrics[1]))
+    pool_metrics[1].attach(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
+
+def sqlite_pragmas() -> list:
+    """The SQLite performance profile from the settings, as PRAGMA statements."""
+    return [
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",  # First, so switching the journal mode waits for locks
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",  # Negative means KiB rather than pages
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+        f"PRAGMA journal_size_limit={settings.SQLITE_JOURNAL_SIZE_LIMIT}",
+    ]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+if is_sqlite and settings.SQLITE_TUNING_ENABLED:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+
+def optimize_sqlite():
+    """Refreshes query planner statistics and checkpoints the WAL without blocking writers."""
+    with engine.connect() as connection:
+        connection.execute(text("PRAGMA optimize"))
+        connection.execute(text("PRAGMA wal_checkpoint(PASSIVE)"))
+
+
+async def run_sqlite_maintenance_loop(interval_seconds: int):
+    """Periodically runs `optimize_sqlite` in a worker thread until cancelled."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(optimize_sqlite)
+        except Exception:
+            logger.exception("Error running SQLite maintenance")
+
 Base = declarative_base()
 
+
+def upsert(db: Session, model, index_elements: list, update=None, where=None):
+    """
+    INSERT for `model` that skips rows conflicting on `index_elements`, or
+    updates them when `update` is given.
+
+    Args:
+        db (Session): Session whose database picks the dialect.
+        model: Mapped class to insert into.
+        index_elements (list): Column names of the unique key.
+        update (Optional[Callable]): Called with the proposed row's columns
+                                     (`excluded`); returns the values to set
+                                     on the existing row.
+        where (Optional[Callable]): Same argument; returns a condition the
+                                    existing row must meet to be updated.
+
+    Raises:
+        NotImplementedError: For databases other than SQLite and PostgreSQL;
+                             bulk ingest also relies on their
+                             ON CONFLICT ... RETURNING.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        statement = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(model)
+        if update is None:
+            return statement.on_conflict_do_nothing(index_elements=index_elements)
+        return statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_=update(statement.excluded),
+            where=where(statement.excluded) if where else None
+        )
+    raise NotImplementedError(f"Upserts are not implemented for {dialect}; use SQLite or PostgreSQL")
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+class ThreadpoolSession:
+    """
+    Stand-in for AsyncSession when DATABASE_URL has a sync driver: `run_sync`
+    runs the function with a regular Session in the threadpool.
+    """
+
+    async def run_sync(self, fn, *args, **kwargs):
+        def call():
+            with SessionLocal() as db:
+                return fn(db, *args, **kwargs)
+        return await run_in_threadpool(call)
+
+
+async def get_async_db():
+    """
+    Session for `async def` handlers. With an async driver in DATABASE_URL
+    (sqlite+aiosqlite://, postgresql+asyncpg://) this is an AsyncSession
+    whose queries never block the event loop; otherwise a ThreadpoolSession.
+    Handlers call `await db.run_sync(fn, ...)` either way.
+    """
+    if AsyncSessionLocal is None:
+        yield ThreadpoolSession()
+        return
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,105 @@
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+import warnings
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+def brier_scores(predictions: list, holdout: pd.DataFrame, employee_ids: list, start_date: date, end_date: date) -> list:
+    """
+    Mean squared error between each employee's predicted presence probability
+    and the held-out outcome (1 present, 0 leave) of their records in the range.
+    """
+    days = pd.date_range(start_date, end_date, freq='D')
+    scores = []
+    for employee_id, prediction in zip(employee_ids, predictions):
+        records = holdout[holdout['employee_id'] == employee_id]
+        if prediction is None or records.empty:
+            scores.append(None)
+            continue
+        probability = prediction[days.get_indexer(records['date'])] / 100
+        outcome = (records['status'] == 'present').to_numpy(dtype=float)
+        scores.append(float(((probability - outcome) ** 2).mean()))
+    return scores
+
+
+def evaluate(source: str, cutoff: date, end_date: date, employee_ids: list, forecaster_names: list):
+    """
+    Trains every forecaster on a copy of `source` truncated after `cutoff`,
+    then scores its predictions for the following days against the removed
+    records. The copy, the Prophet models and the snapshot files live in a
+    temporary directory, so the source database is only read.
+    """
+    workdir = tempfile.mkdtemp(prefix="forecaster-evaluation-")
+    database = os.path.join(workdir, "attendance.db")
+    shutil.copy(source, database)
+    # The settings are read when the project modules are imported, so point them at the copy first
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ["PROPHET_MODEL_DIR"] = os.path.join(workdir, "prophet_models")
+    os.environ["ATTENDANCE_SNAPSHOT_DIR"] = os.path.join(workdir, "attendance_snapshots")
+
+    from database import Base, SessionLocal, engine
+    from holiday_calendar import import_company_holidays_from_attendance
+    from migrations import run_migrations
+    from models import Attendance
+    from prophet_attendance import FORECASTERS
+
+    logging.getLogger("cmdstanpy").disabled = True  # Logs every Prophet fit at INFO, whatever its level
+    try:
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        db = SessionLocal()
+        try:
+            # Company holidays are known ahead, so they are recovered before the holdout is removed
+            import_company_holidays_from_attendance(db)
+
+            first_day = cutoff + pd.Timedelta(days=1)
+            held_out = Attendance.date.between(first_day, end_date)
+            holdout = pd.read_sql(
+                db.query(Attendance.employee_id, Attendance.date, Attendance.status)
+                .filter(held_out, Attendance.status != 'holiday').statement,
+                db.bind
+            )
+            holdout['date'] = pd.to_datetime(holdout['date'])
+            db.query(Attendance).filter(Attendance.date > cutoff).delete(synchronize_session=False)
+            db.commit()
+
+            present_share = (holdout['status'] == 'present').mean()
+            print(f"{len(holdout)} held-out records from {first_day} to {end_date}, {len(employee_ids)} employees")
+            print(f"constant-rate reference: Brier {present_share * (1 - present_share):.4f}")
+
+            for name in forecaster_names:
+                forecaster = FORECASTERS[name]
+                started = time.perf_counter()
+                predictions = forecaster.predict_range(db, employee_ids, first_day, end_date)
+                cold = time.perf_counter() - started
+                started = time.perf_counter()
+                forecaster.predict_range(db, employee_ids, first_day, end_date)
+                warm = time.perf_counter() - started
+
+                scores = [score for score in brier_scores(predictions, holdout, employee_ids, first_day, end_date) if score is not None]
+                print(f"{name:>9}: {cold:.2f}s cold, {warm:.2f}s warm, Brier {np.mean(scores):.4f} over {len(scores)} employees")
+        finally:
+            db.close()
+    finally:
+        engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare forecaster accuracy and latency on held-out attendance.")
+    parser.add_argument("--database", default="employee_attendance.db", help="SQLite database to evaluate on; it is copied, not modified")
+    parser.add_argument("--cutoff", type=date.fromisoformat, default=date(2024, 10, 31), help="Last day of training data")
+    parser.add_argument("--end", type=date.fromisoformat, default=date(2024, 12, 31), help="Last held-out day")
+    parser.add_argument("--employees", type=int, nargs="*", default=list(range(1, 12)), help="Employee ids to predict")
+    parser.add_argument("--forecasters", nargs="*", default=["prophet", "baseline"], help="Forecaster names to compare")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    evaluate(args.database, args.cutoff, args.end, args.employees, args.forecasters)
@@ -0,0 +1,136 @@
+import argparse
+import threading
+from datetime import date
+from typing import Dict, FrozenSet, Optional
+
+import holidays
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, engine, Base
+from models import Attendance, CompanyHoliday
+from response_cache import response_cache
+
+
+class HolidayCalendar:
+    """
+    Country holidays plus company holidays from the `company_holidays` table.
+
+    Holidays are merged once per year, then served from memory, so the cache
+    is bounded by the years requested rather than by the distinct ranges;
+    writing company holidays through this class invalidates it.
+    """
+
+    def __init__(self, country: str):
+        self.country = country
+        self._country_years = {}
+        self._company = None
+        self._years = {}
+        self._lock = threading.Lock()
+
+    def _country_holidays(self, year: int) -> dict:
+        if year not in self._country_years:
+            self._country_years[year] = dict(holidays.country_holidays(self.country, years=year))
+        return self._country_years[year]
+
+    def _company_holidays(self) -> dict:
+        if self._company is None:
+            db = SessionLocal()
+            try:
+                self._company = dict(db.query(CompanyHoliday.date, CompanyHoliday.name).all())
+            finally:
+                db.close()
+        return self._company
+
+    def _year_holidays(self, year: int) -> Dict[date, str]:
+        """Country and company holidays of one year, sorted by date; company names win."""
+        if year not in self._years:
+            merged = dict(self._country_holidays(year))
+            merged.update((day, name) for day, name in self._company_holidays().items() if day.year == year)
+            self._years[year] = {day: merged[day] for day in sorted(merged)}
+        return self._years[year]
+
+    def holidays(self, start_date: date, end_date: date) -> Dict[date, str]:
+        """Returns {date: name} for every holiday between the two dates (inclusive), sorted by date."""
+        with self._lock:
+            return {
+                day: name
+                for year in range(start_date.year, end_date.year + 1)
+                for day, name in self._year_holidays(year).items()
+                if start_date <= day <= end_date
+            }
+
+    def holiday_dates(self, start_date: date, end_date: date) -> FrozenSet[date]:
+        return frozenset(self.holidays(start_date, end_date))
+
+    def invalidate(self):
+        with self._lock:
+            self._company = None
+            self._years.clear()
+
+    def add_company_holidays(self, db: Session, company_holidays: Dict[date, str]):
+        """Stores company holidays, replacing existing names, and refreshes the cache."""
+        for day, name in company_holidays.items():
+            holiday = db.query(CompanyHoliday).filter(CompanyHoliday.date == day).first()
+            if holiday is None:
+                db.add(CompanyHoliday(date=day, name=name))
+            else:
+                holiday.name = name
+        db.commit()
+        self.invalidate()
+        response_cache.invalidate_days("holidays", company_holidays)
+
+
+holiday_calendar = HolidayCalendar(settings.HOLIDAY_COUNTRY)
+
+
+def import_company_holidays_from_attendance(db: Session) -> Dict[date, str]:
+    """
+    Recovers company holidays for databases generated before they were stored:
+    weekdays with holiday attendance records, no one present and no country
+    holiday are recorded as company holidays.
+    """
+    days = db.query(
+        Attendance.date,
+        func.sum(case((Attendance.status == 'holiday', 1), else_=0)),
+        func.sum(case((Attendance.status == 'present', 1), else_=0))
+    ).filter(Attendance.is_weekday.is_(True)).group_by(Attendance.date).all()
+
+    if not days:
+        return {}
+
+    first_day = min(day for day, _, _ in days)
+    last_day = max(day for day, _, _ in days)
+    country_dates = set()
+    for year in range(first_day.year, last_day.year + 1):
+        country_dates.update(holidays.country_holidays(holiday_calendar.country, years=year))
+
+    company_holidays = {
+        day: "Company Holiday"
+        for day, holiday_count, present_count in days
+        if holiday_count and not present_count and day not in country_dates
+    }
+    holiday_calendar.add_company_holidays(db, company_holidays)
+    return company_holidays
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage company holidays.")
+    parser.add_argument("--import-from-attendance", action="store_true",
+                        help="Record holiday-only weekdays in attendance as company holidays")
+    parser.add_argument("--add", type=date.fromisoformat, nargs="*", default=[], help="Dates to add (YYYY-MM-DD)")
+    parser.add_argument("--name", default="Company Holiday", help="Name for dates passed with --add")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.import_from_attendance:
+            imported = import_company_holidays_from_attendance(db)
+            print(f"Imported {len(imported)} company holidays from attendance records")
+        if args.add:
+            holiday_calendar.add_company_holidays(db, {day: args.name for day in args.add})
+            print(f"Added {len(args.add)} company holidays")
+    finally:
+        db.close()
@@ -1,18 +1,31 @@
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, extract
 from typing import List, Optional
-from datetime import date, datetime, timedelta
-from collections import defaultdict
+from datetime import date
 
 # Local imports
-from database import engine, get_db
+from database import engine, get_db, get_async_db, SessionLocal, is_sqlite, run_sqlite_maintenance_loop, pool_metrics
 from models import Base, Employee, Attendance
 from routers import employee, attendance , leave_request , analytics
+from attendance_stats import compute_attendance_stats
+from attendance_rollup import backfill_if_empty
+import attendance_summary
+from migrations import run_migrations
+from anomaly_scoring import run_scoring_loop
+from checkin_queue import checkin_queue
+from response_cache import response_cache
+from config import settings
+from schemas import schemas
 # Create tables
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+
+with SessionLocal() as db:
+    backfill_if_empty(db)
+    attendance_summary.backfill_if_empty(db)
 
 app = FastAPI(
     title="MoveMark API",
@@ -32,9 +45,11 @@ def custom_openapi():
     )
     
     # Customize the schema for better Swagger UI display
-    for path in openapi_schema["paths"]:
-        if "/anomalies" in path:
-            openapi_schema["paths"][path]["get"]["parameters"][0]["x-slider"] = True
+    # Only GET /analytics/anomalies has the threshold; other anomaly paths are POST-only
+    anomalies = openapi_schema["paths"].get("/analytics/anomalies", {}).get("get", {})
+    for parameter in anomalies.get("parameters", []):
+        if parameter["name"] == "anomaly_threshold":
+            parameter["x-slider"] = True
     
     app.openapi_schema = openapi_schema
     return app.openapi_schema
@@ -48,6 +63,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor of the attendance listings
 )
 
 # Include routers
@@ -56,16 +72,54 @@ app.include_router(attendance.router)
 app.include_router(leave_request.router)
 app.include_router(analytics.router) 
 
+background_tasks = set()
+
+@app.on_event("startup")
+async def start_background_jobs():
+    checkin_queue.start()
+    if settings.ANOMALY_SCORING_INTERVAL_SECONDS > 0:
+        background_tasks.add(asyncio.create_task(
+            run_scoring_loop(settings.ANOMALY_SCORING_INTERVAL_SECONDS)
+        ))
+    if is_sqlite and settings.SQLITE_MAINTENANCE_INTERVAL_SECONDS > 0:
+        background_tasks.add(asyncio.create_task(
+            run_sqlite_maintenance_loop(settings.SQLITE_MAINTENANCE_INTERVAL_SECONDS)
+        ))
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    # Flush queued check-ins before the process exits
+    await checkin_queue.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Employee Attendance System"}
 
+@app.get("/metrics", response_model=schemas.ServiceMetrics, description="Connection pool, check-in queue and response cache health.")
+def get_metrics():
+    return {
+        "database_pools": [metrics.snapshot() for metrics in pool_metrics],
+        "checkin_queue": checkin_queue.metrics(),
+        "response_cache": response_cache.metrics()
+    }
+
 @app.get("/attendance-stats")
-def get_attendance_stats(
+async def get_attendance_stats(
+    request: Request,
     target_date: Optional[date] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db)
+    trend_bucket_minutes: Optional[int] = Query(
+        default=None,
+        ge=1,
+        le=240,
+        description="Bucket width of the single-date check-in/check-out trends. Defaults to TREND_BUCKET_MINUTES."
+    ),
+    db=Depends(get_async_db)
 ):
     if target_date:
         start_date = target_date
@@ -79,181 +133,12 @@ def get_attendance_stats(
     if start_date > end_date:
         raise HTTPException(status_code=400, detail="Start date cannot be after end date")
 
-    base_query = db.query(Attendance).filter(
-        Attendance.date.between(start_date, end_date),
-        func.extract('dow', Attendance.date).notin_([0, 6])
+    return await response_cache.respond(
+        request,
+        "attendance-stats",
+        {"start_date": start_date, "end_date": end_date, "target_date": target_date, "trend_bucket_minutes": trend_bucket_minutes},
+        lambda: db.run_sync(compute_attendance_stats, start_date, end_date, target_date, trend_bucket_minutes),
+        sources=("attendance", "employees", "holidays"),
+        start_date=start_date,
+        end_date=end_date
     )
-
-    total_records = base_query.count()
-    present_records = base_query.filter(Attendance.status == "present").count()
-    absent_records = total_records - present_records
-
-    dept_stats = db.query(
-        Employee.department,
-        func.count(Attendance.id).label('total'),
-        func.sum(
-            case(
-                (Attendance.status == 'present', 1),
-                else_=0
-            )
-        ).label('present')
-    ).join(Employee).filter(
-        Attendance.date.between(start_date, end_date),
-        func.extract('dow', Attendance.date).notin_([0, 6])
-    ).group_by(Employee.department).all()
-
-    date_diff = (end_date - start_date).days
-    if target_date:  # Single date - show minute-wise trend for check-ins
-        trend_query = db.query(
-            func.strftime('%H:%M', Attendance.checkin_time).label('minute'),
-            func.count().label('total'),
-            func.sum(
-                case(
-                    (Attendance.status == 'present', 1),
-                    else_=0
-                )
-            ).label('present')
-        ).filter(
-            Attendance.date == target_date,
-            func.extract('dow', Attendance.date).notin_([0, 6]),
-            func.strftime('%H:%M', Attendance.checkin_time).between('08:00', '10:00')
-        ).group_by('minute')
-        
-        # Create a dictionary with 5-minute intervals
-        intervals = {}
-        current_time = datetime.strptime('08:00', '%H:%M')
-        end_time = datetime.strptime('10:00', '%H:%M')
-        
-        while current_time <= end_time:
-            intervals[current_time.strftime('%H:%M')] = 0
-            current_time += timedelta(minutes=5)
-
-        # Fill in the actual data with check-in times
-        raw_data = {
-            minute: total
-            for minute, total, _ in trend_query.all()
-        }
-
-        # Aggregate into 5-minute intervals
-        trend_data = {}
-        for interval_start in intervals.keys():
-            interval_end = (datetime.strptime(interval_start, '%H:%M') + timedelta(minutes=5)).strftime('%H:%M')
-            count = sum(
-                count
-                for time, count in raw_data.items()
-                if interval_start <= time < interval_end
-            )
-            trend_data[interval_start] = count
-
-    elif date_diff > 30:  # Monthly trend - existing code
-        trend_query = db.query(
-            func.strftime('%Y-%m', Attendance.date).label('month'),
-            func.count().label('total'),
-            func.sum(
-                case(
-                    (Attendance.status == 'present', 1),
-                    else_=0
-                )
-            ).label('present')
-        ).filter(
-            Attendance.date.between(start_date, end_date),
-            func.extract('dow', Attendance.date).notin_([0, 6])
-        ).group_by('month')
-        trend_data = {
-            month: round((present / total * 100), 2) if total > 0 else 0
-            for month, total, present in trend_query.all()
-        }
-    else: 
-        trend_query = db.query(
-            Attendance.date,
-            func.count().label('total'),
-            func.sum(
-                case(
-                    (Attendance.status == 'present', 1),
-                    else_=0
-                )
-            ).label('present')
-        ).filter(
-            Attendance.date.between(start_date, end_date),
-            func.extract('dow', Attendance.date).notin_([0, 6])
-        ).group_by(Attendance.date)
-        trend_data = {
-            date.strftime("%Y-%m-%d"): round((present / total * 100), 2) if total > 0 else 0
-            for date, total, present in trend_query.all()
-        }
-
-    # Replace the top performers section with early comers for single date
-    early_comers_data = []
-    if target_date:
-        early_comers = db.query(
-            Employee.employee_name,
-            Attendance.checkin_time
-        ).join(Employee).filter(
-            Attendance.date == target_date,
-            Attendance.status == 'present',
-            Attendance.checkin_time.isnot(None)  # Only include records with valid check-in times
-        ).order_by(
-            Attendance.checkin_time  # Sort by check-in time ascending
-        ).limit(5).all()
-
-        early_comers_data = [
-            {
-                "name": name,
-                "check_in_time": checkin_time.strftime('%H:%M') if checkin_time else None
-            }
-            for name, checkin_time in early_comers
-        ]
-    else:
-        # Existing top performers code for date ranges
-        top_performers = db.query(
-            Employee.employee_name,
-            func.count().label('total_days'),
-            func.sum(
-                case(
-                    (Attendance.status == 'present', 1),
-                    else_=0
-                )
-            ).label('present_days')
-        ).join(Attendance).filter(
-            Attendance.date.between(start_date, end_date),
-            func.extract('dow', Attendance.date).notin_([0, 6])
-        ).group_by(
-            Employee.employee_id
-        ).having(
-            func.count() > 0
-        ).order_by(
-            (func.sum(
-                case(
-                    (Attendance.status == 'present', 1),
-                    else_=0
-                )
-            ) * 100 / func.count()).desc()
-        ).limit(5).all()
-
-        top_performers_data = [
-            {
-                "name": name,
-                "percentage": round((present_days / total_days * 100), 2) if total_days > 0 else 0
-            }
-            for name, total_days, present_days in top_performers
-        ]
-
-    return {
-        "overall_stats": {
-            "percentage": round((present_records / total_records * 100), 2) if total_records > 0 else 0,
-            "present": f"{present_records}/{total_records}",
-            "absent": f"{absent_records}/{total_records}"
-        },
-        "department_stats": {
-            dept: round((present / total * 100), 2) if total > 0 else 0
-            for dept, total, present in dept_stats
-        },
-        "attendance_trend": trend_data,
-        "early_comers": early_comers_data if target_date else [],  # Return early comers for single date
-        "top_performers": [] if target_date else top_performers_data,  # Return top performers for date range
-        "date_info": {
-            "start_date": str(start_date),
-            "end_date": str(end_date),
-            "is_single_date": target_date is not None
-        }
-    }
\ No newline at end of file
@@ -0,0 +1,163 @@
+import argparse
+from typing import List
+
+from sqlalchemy import inspect, select, text, true, update, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from attendance_rollup import refresh_rollup_days
+from attendance_snapshot import mark_months_changed
+from attendance_summary import refresh_summaries
+from database import Base, engine
+from models import Attendance, AttendanceAnomalyRecord, AttendanceDailyRollup, AttendanceSnapshotMonth, EmployeeAttendanceSummary
+
+DELETE_CHUNK_SIZE = 500  # Keeps IN lists well below SQLite's bound parameter limit
+
+
+def _add_attendance_is_weekday(connection):
+    """Adds and backfills `attendances.is_weekday` on databases created before it existed."""
+    columns = {column["name"] for column in inspect(connection).get_columns("attendances")}
+    if "is_weekday" in columns:
+        return
+
+    # Boolean literals differ between databases (1 on SQLite, true on PostgreSQL)
+    default = true().compile(connection, compile_kwargs={"literal_binds": True})
+    connection.execute(text(
+        f"ALTER TABLE attendances ADD COLUMN is_weekday BOOLEAN NOT NULL DEFAULT {default}"
+    ))
+    connection.execute(
+        update(Attendance.__table__).values(
+            is_weekday=func.extract('dow', Attendance.date).notin_([0, 6])
+        )
+    )
+
+
+def find_duplicate_attendance(connection) -> List[tuple]:
+    """
+    Returns the attendance records sharing an (employee_id, date) key with
+    another record, as (id, employee_id, date, status, checkin_time,
+    checkout_time) tuples ordered by key and id.
+    """
+    duplicated = select(Attendance.employee_id, Attendance.date).group_by(
+        Attendance.employee_id, Attendance.date
+    ).having(func.count() > 1).subquery()
+    return connection.execute(
+        select(
+            Attendance.id, Attendance.employee_id, Attendance.date,
+            Attendance.status, Attendance.checkin_time, Attendance.checkout_time
+        ).join(
+            duplicated,
+            (Attendance.employee_id == duplicated.c.employee_id) & (Attendance.date == duplicated.c.date)
+        ).order_by(Attendance.employee_id, Attendance.date, Attendance.id)
+    ).all()
+
+
+def remove_duplicate_attendance(connection) -> List[tuple]:
+    """
+    Keeps the latest (highest id) record of each duplicated (employee_id,
+    date) key and deletes the others with their anomaly scores, then
+    recomputes the rollup days, summaries and snapshot months they were
+    counted in.
+
+    Returns:
+        List[tuple]: The deleted records, as from `find_duplicate_attendance`.
+    """
+    duplicates = find_duplicate_attendance(connection)
+    latest = {}
+    for record in duplicates:
+        latest[(record[1], record[2])] = record[0]  # Ordered by id, so the last one wins
+    removed = [record for record in duplicates if record[0] != latest[(record[1], record[2])]]
+    if not removed:
+        return []
+
+    ids = [record[0] for record in removed]
+    tables = set(inspect(connection).get_table_names())
+    db = Session(bind=connection)
+    for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+        chunk = ids[start:start + DELETE_CHUNK_SIZE]
+        if AttendanceAnomalyRecord.__tablename__ in tables:
+            db.query(AttendanceAnomalyRecord).filter(
+                AttendanceAnomalyRecord.attendance_id.in_(chunk)
+            ).delete(synchronize_session=False)
+        db.query(Attendance).filter(Attendance.id.in_(chunk)).delete(synchronize_session=False)
+
+    # Empty tables are built from scratch at startup instead
+    days = {record[2] for record in removed}
+    if AttendanceDailyRollup.__tablename__ in tables and db.query(AttendanceDailyRollup).first() is not None:
+        refresh_rollup_days(db, days)
+    if EmployeeAttendanceSummary.__tablename__ in tables and db.query(EmployeeAttendanceSummary).first() is not None:
+        refresh_summaries(db, {record[1] for record in removed})
+    if AttendanceSnapshotMonth.__tablename__ in tables:
+        mark_months_changed(db, days)
+    db.flush()
+    return removed
+
+
+def _make_attendance_key_unique(connection):
+    """
+    Replaces the plain (employee_id, date) index of databases created before
+    it was unique. Duplicated records are never removed here: the migration
+    stops until they are reviewed and repaired with this module's CLI.
+    """
+    index = next(index for index in Attendance.__table__.indexes if index.name == "ix_attendances_employee_id_date")
+    existing = {existing["name"]: existing for existing in inspect(connection).get_indexes("attendances")}
+    if existing.get(index.name, {}).get("unique"):
+        return
+
+    duplicated_keys = connection.execute(
+        select(func.count()).select_from(
+            select(Attendance.employee_id).group_by(Attendance.employee_id, Attendance.date).having(func.count() > 1).subquery()
+        )
+    ).scalar()
+    if duplicated_keys:
+        raise RuntimeError(
+            f"{duplicated_keys} (employee_id, date) keys have more than one attendance record, so the unique "
+            "index on them cannot be built. List them with `python migrations.py --list-duplicates` and keep "
+            "the latest record of each with `python migrations.py --remove-duplicates`."
+        )
+
+    if index.name in existing:
+        index.drop(bind=connection)
+
+
+def _create_missing_indexes(connection):
+    # create_all() skips tables that already exist, including their new indexes
+    for index in Attendance.__table__.indexes:
+        index.create(bind=connection, checkfirst=True)
+
+
+def run_migrations(engine: Engine):
+    """
+    Brings an existing database up to the current schema.
+
+    Safe to run on every startup; each step checks whether it is needed first.
+    """
+    with engine.begin() as connection:
+        _add_attendance_is_weekday(connection)
+        _make_attendance_key_unique(connection)
+        _create_missing_indexes(connection)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the schema migrations, or repair what blocks them.")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--list-duplicates", action="store_true",
+                        help="List attendance records sharing an (employee_id, date) key")
+    action.add_argument("--remove-duplicates", action="store_true",
+                        help="Keep the latest record of each duplicated key and delete the others")
+    args = parser.parse_args()
+
+    if args.list_duplicates or args.remove_duplicates:
+        with engine.begin() as connection:
+            records = remove_duplicate_attendance(connection) if args.remove_duplicates else find_duplicate_attendance(connection)
+        for attendance_id, employee_id, day, status, checkin_time, checkout_time in records:
+            print(f"  id {attendance_id}: employee {employee_id} on {day}, {status}, in {checkin_time}, out {checkout_time}")
+        keys = len({(employee_id, day) for _, employee_id, day, *_ in records})
+        if args.remove_duplicates:
+            print(f"Removed {len(records)} attendance records, keeping the latest of {keys} duplicated keys")
+        else:
+            print(f"Found {len(records)} attendance records sharing {keys} (employee_id, date) keys")
+    else:
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        print("Migrations applied")
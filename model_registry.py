@@ -0,0 +1,74 @@
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class ModelRegistry:
+    """
+    Thread-safe in-memory LRU store for fitted models.
+
+    Each entry is keyed by an identifier (e.g. employee id) and tagged with a
+    data watermark. A lookup only hits when the caller's current watermark
+    matches the one the model was fitted on, so models are refit exactly when
+    their training data changes. Least recently used entries are evicted once
+    the estimated size of all entries exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (watermark, value, nbytes)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, watermark: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != watermark:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def peek(self, key: Hashable) -> Optional[tuple]:
+        """Returns (watermark, value) for `key` regardless of freshness, without touching LRU order."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else (entry[0], entry[1])
+
+    def put(self, key: Hashable, watermark: Any, value: Any, nbytes: Optional[int] = None):
+        if nbytes is None:
+            nbytes = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous[2]
+
+            self._entries[key] = (watermark, value, nbytes)
+            self._total_bytes += nbytes
+
+            # Always keep the entry just added, even if it alone exceeds the budget
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
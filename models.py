@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Boolean, JSON, Index, Float
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -14,8 +14,15 @@ class Employee(Base):
     
     attendances = relationship("Attendance", back_populates="employee")
 
+def _is_weekday(context):
+    return context.get_current_parameters()["date"].weekday() < 5
+
 class Attendance(Base):
     __tablename__ = "attendances"
+    __table_args__ = (
+        Index("ix_attendances_employee_id_date", "employee_id", "date", unique=True),  # One record per employee and day
+        Index("ix_attendances_date_status", "date", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.employee_id"))
@@ -23,6 +30,7 @@ class Attendance(Base):
     checkin_time = Column(DateTime)
     checkout_time = Column(DateTime)
     status = Column(String(20))
+    is_weekday = Column(Boolean, nullable=False, default=_is_weekday)  # Stored so weekday filters are a column test on the rows the indexes find, not a per-row day-of-week computation
     
     employee = relationship("Employee", back_populates="attendances")
 
@@ -36,4 +44,105 @@ class LeaveRequest(Base):
     leave_period = Column(String(20), nullable=True)  # "forenoon" or "afternoon" if is_half_day is True
     reason = Column(String(200))
 
-    employee = relationship("Employee")
\ No newline at end of file
+    employee = relationship("Employee")
+
+class CompanyHoliday(Base):
+    __tablename__ = "company_holidays"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, unique=True, nullable=False)
+    name = Column(String(100), nullable=False)
+
+class AttendanceDailyRollup(Base):
+    """
+    Pre-aggregated attendance counts per date x department x employee.
+
+    Rows with `employee_id == DEPARTMENT_TOTAL` hold the department-wide
+    totals for the day, so range queries over a department touch one row
+    per day instead of one per attendance record.
+    """
+    __tablename__ = "attendance_daily_rollup"
+
+    DEPARTMENT_TOTAL = 0
+
+    date = Column(Date, primary_key=True)
+    department = Column(String(50), primary_key=True)
+    employee_id = Column(Integer, primary_key=True)
+    is_weekday = Column(Boolean, nullable=False)
+    total = Column(Integer, nullable=False, default=0)
+    present = Column(Integer, nullable=False, default=0)
+    leave = Column(Integer, nullable=False, default=0)
+    holiday = Column(Integer, nullable=False, default=0)
+    first_checkin_minute = Column(Integer)  # Earliest present check-in, minutes since midnight
+    last_checkout_minute = Column(Integer)
+    checkin_histogram = Column(JSON)  # {"minute of day": count}
+    checkout_histogram = Column(JSON)
+
+class EmployeeAttendanceSummary(Base):
+    """
+    Running attendance counters per employee, maintained in the same
+    transaction as attendance writes so employee reads never aggregate
+    attendance history.
+
+    Streaks count consecutive present records by date; holiday records
+    neither extend nor break them.
+    """
+    __tablename__ = "employee_attendance_summary"
+
+    employee_id = Column(Integer, ForeignKey("employees.employee_id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    present = Column(Integer, nullable=False, default=0)
+    leave = Column(Integer, nullable=False, default=0)
+    holiday = Column(Integer, nullable=False, default=0)
+    last_date = Column(Date)  # Latest attendance date; later records are folded in incrementally
+    last_checkin_time = Column(DateTime)
+    current_present_streak = Column(Integer, nullable=False, default=0)
+    longest_present_streak = Column(Integer, nullable=False, default=0)
+
+class AttendanceAnomalyRecord(Base):
+    """
+    Persisted Isolation Forest score for one attendance record.
+
+    Every scored record is stored, not only anomalies, so the API threshold
+    can be applied at read time as an indexed range filter.
+    """
+    __tablename__ = "attendance_anomalies"
+    __table_args__ = (
+        Index("ix_attendance_anomalies_score", "anomaly_score", "employee_id", "attendance_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    attendance_id = Column(Integer, ForeignKey("attendances.id"), unique=True, nullable=False)
+    employee_id = Column(Integer, ForeignKey("employees.employee_id"), index=True, nullable=False)
+    date = Column(Date, nullable=False)
+    anomaly_score = Column(Float, nullable=False)  # Raw Isolation Forest score, lower is more anomalous
+    anomaly_type = Column(String(50), nullable=False)
+    is_late_checkin = Column(Boolean, nullable=False, default=False)
+    is_early_checkout = Column(Boolean, nullable=False, default=False)
+    is_low_attendance = Column(Boolean, nullable=False, default=False)
+    scored_at = Column(DateTime, default=datetime.utcnow)
+
+class AttendanceUpdateCounter(Base):
+    """
+    Count of in-place attendance updates per employee, bumped in the same
+    transaction as the update. Inserts move the (max id, count) watermark
+    forecast models are tagged with; updates keep it, so they move this.
+    The `ALL_EMPLOYEES` row counts updates for every employee.
+    """
+    __tablename__ = "attendance_update_counters"
+
+    ALL_EMPLOYEES = 0
+
+    employee_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class AttendanceSnapshotMonth(Base):
+    """
+    Change counter per attendance month, bumped in the same transaction as
+    attendance writes so the columnar snapshot export rewrites only the
+    months that changed since it last ran.
+    """
+    __tablename__ = "attendance_snapshot_months"
+
+    month = Column(String(7), primary_key=True)  # "YYYY-MM"
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """
+    Counters for one engine's connection pool.
+
+    Checkouts, checkins and new connections come from pool events; the wait
+    for a connection is timed inside the pool class returned by
+    `metered_pool_class`, since no event fires before a checkout blocks.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool):
+        with self._lock:
+            self.waits += 1
+            self.total_wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def _count(self, counter: str):
+        def listener(*args):
+            with self._lock:
+                setattr(self, counter, getattr(self, counter) + 1)
+        return listener
+
+    def attach(self, engine):
+        """Listens to the pool events of a sync engine (for an AsyncEngine pass `.sync_engine`)."""
+        self.engine = engine
+        event.listen(engine, "connect", self._count("connects"))
+        event.listen(engine, "checkout", self._count("checkouts"))
+        event.listen(engine, "checkin", self._count("checkins"))
+        event.listen(engine, "invalidate", self._count("invalidations"))
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None  # Replaced by engine.dispose()
+        queue_pool = pool if isinstance(pool, QueuePool) else None  # Only queue pools have a size and overflow
+        with self._lock:
+            return {
+                "name": self.name,
+                "pool_class": type(pool).__name__ if pool is not None else None,
+                "size": queue_pool.size() if queue_pool else None,
+                "checked_out": self.checkouts - self.checkins,
+                "checked_in": queue_pool.checkedin() if queue_pool else None,
+                "overflow": max(queue_pool.overflow(), 0) if queue_pool else None,
+                "max_overflow": queue_pool._max_overflow if queue_pool else None,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.total_wait_seconds / self.waits * 1000 if self.waits else None,
+                "max_wait_ms": self.max_wait_seconds * 1000
+            }
+
+
+def metered_pool_class(pool_class, metrics: PoolMetrics):
+    """
+    Subclass of `pool_class` that times every connection request, including
+    the time spent waiting for a free connection when the pool is exhausted.
+    """
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return pool_class._do_get(self)
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            metrics.record_wait(time.perf_counter() - started, timed_out)
+
+    return type(f"Metered{pool_class.__name__}", (pool_class,), {"_do_get": _do_get})
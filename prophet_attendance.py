@@ -1,13 +1,65 @@
+import numpy as np
 import pandas as pd
 from prophet import Prophet
 from datetime import date, timedelta
-import holidays
+from holiday_calendar import holiday_calendar
+from attendance_snapshot import load_attendance
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 from database import get_db
 from models import Attendance, Employee
-from typing import Optional
+from typing import List, Optional
+from config import settings
 from fastapi import Depends
 
+TRAINING_CHUNK_ROWS = 5000
+
+
+def load_training_frame(db: Session, employee_id: Optional[int] = None) -> pd.DataFrame:
+    """
+    Loads the Prophet training frame: one row per working day with `y` the
+    share of attendance records marked present (1 or 0 for a single employee).
+
+    Weekends, holidays and holiday records are excluded in SQL, so leave
+    counts as absence and non-working days never enter the fit. Rows are
+    streamed in chunks straight into typed NumPy columns.
+
+    Args:
+        employee_id (Optional[int]): Employee ID to filter attendance data.
+                                      If None, uses all employee data.
+        db (Session): Database session.
+
+    Returns:
+        pd.DataFrame: Columns `ds` (datetime64) and `y` (float64), sorted by date.
+    """
+    filters = [Attendance.is_weekday.is_(True), Attendance.status != 'holiday']
+    if employee_id:
+        filters.append(Attendance.employee_id == employee_id)
+
+    ds_chunks = [np.array([], dtype='datetime64[D]')]
+    y_chunks = [np.array([], dtype=np.float64)]
+
+    first_day, last_day = db.query(func.min(Attendance.date), func.max(Attendance.date)).filter(*filters).one()
+    if first_day is not None:
+        present = case((Attendance.status == 'present', 1.0), else_=0.0)
+        result = db.execute(
+            select(Attendance.date, func.avg(present))
+            .where(*filters, Attendance.date.notin_(holiday_calendar.holiday_dates(first_day, last_day)))
+            .group_by(Attendance.date)
+            .order_by(Attendance.date)
+            .execution_options(yield_per=TRAINING_CHUNK_ROWS)
+        )
+        for chunk in result.partitions():
+            days, rates = zip(*chunk)
+            ds_chunks.append(np.array(days, dtype='datetime64[D]'))
+            y_chunks.append(np.array(rates, dtype=np.float64))
+
+    return pd.DataFrame({
+        'ds': np.concatenate(ds_chunks).astype('datetime64[ns]'),
+        'y': np.concatenate(y_chunks)
+    })
+
+
 def create_prophet_model(employee_id: Optional[int] = None, db: Session = Depends(get_db)):
     """
     Creates and trains a Prophet model for attendance prediction.
@@ -20,38 +72,43 @@ def create_prophet_model(employee_id: Optional[int] = None, db: Session = Depend
     Returns:
         Prophet: Trained Prophet model.
     """
+    df = load_training_frame(db, employee_id)
+    if df.empty:
+        raise ValueError("No attendance records found for the given employee ID.")
 
-    # 1. Fetch Attendance Data
-    query = db.query(Attendance.date, Attendance.status)
-    if employee_id:
-        query = query.filter(Attendance.employee_id == employee_id)
-    attendance_records = query.all()
+    # Holidays and weekends are not in the training data; prediction zeroes them instead
+    model = Prophet()
+    model.fit(df)
 
-    if not attendance_records:
-        raise ValueError("No attendance records found for the given employee ID.")
+    return model
 
-    df = pd.DataFrame([(record.date, record.status) for record in attendance_records], columns=['ds', 'status'])
 
-    # Convert 'ds' to datetime and filter for present days
-    df['ds'] = pd.to_datetime(df['ds'])
-    df = df[df['status'] == 'present']  # Only model 'present' days
-    df['y'] = 1  # Prophet needs a numeric target variable
+def _closed_days(days: pd.DatetimeIndex, start_date: date, end_date: date) -> np.ndarray:
+    """Boolean mask of weekends and calendar holidays, on which no attendance is expected."""
+    holiday_dates = holiday_calendar.holiday_dates(start_date, end_date)
+    return (days.dayofweek >= 5) | np.isin(days.date, list(holiday_dates))
 
-    # 2. Handle Holidays
-    # Fetch all holidays for the year
-    start_date = df['ds'].min().to_pydatetime().date()
-    end_date = df['ds'].max().to_pydatetime().date()
-    years = list(range(start_date.year, end_date.year + 1))
-    all_holidays = holidays.country_holidays('US', years=years)  # Or your country code
 
-    holidays_df = pd.DataFrame([(date, all_holidays.get(date)) for date in sorted(all_holidays.keys())], columns=['ds', 'holiday'])
-    holidays_df['ds'] = pd.to_datetime(holidays_df['ds'])
+def predict_attendance_range(model: Prophet, start_date: date, end_date: date) -> np.ndarray:
+    """
+    Predicts attendance probabilities for every day in a date range with a
+    single `model.predict` call.
 
-    # 3. Create and Fit the Prophet Model
-    model = Prophet(holidays=holidays_df)
-    model.fit(df)
+    Args:
+        model (Prophet): Trained Prophet model.
+        start_date (date): First day to predict (inclusive).
+        end_date (date): Last day to predict (inclusive).
 
-    return model
+    Returns:
+        np.ndarray: Predicted attendance probability (0 to 100) per day.
+    """
+    days = pd.date_range(start_date, end_date, freq='D')
+    forecast = model.predict(pd.DataFrame({'ds': days}))
+
+    # Convert to probability (0-100) - the model is trained on present shares between 0 and 1
+    probabilities = np.clip(forecast['yhat'].to_numpy(), 0, 1) * 100  # Clamp values
+    probabilities[_closed_days(days, start_date, end_date)] = 0
+    return probabilities
 
 
 def predict_attendance(model: Prophet, future_date: date) -> float:
@@ -65,13 +122,158 @@ def predict_attendance(model: Prophet, future_date: date) -> float:
     Returns:
         float: Predicted attendance probability (0 to 100).
     """
-    future = pd.DataFrame([future_date], columns=['ds'])
-    future['ds'] = pd.to_datetime(future['ds'])
-    forecast = model.predict(future)
-    # The 'yhat' column contains the prediction
-    predicted_value = forecast['yhat'][0]
+    return float(predict_attendance_range(model, future_date, future_date)[0])
 
-    # Convert to probability (0-100) - assuming y values are 0 or 1
-    probability = min(max(predicted_value, 0), 1) * 100  # Clamp values
 
-    return probability
\ No newline at end of file
+class AttendanceForecaster:
+    """
+    Interface for attendance forecasting backends.
+
+    Implementations predict every day of a date range for many employees in
+    one call. An employee id of None means the all-employee aggregate.
+    """
+
+    name = None
+
+    def predict_range(
+        self,
+        db: Session,
+        employee_ids: List[Optional[int]],
+        start_date: date,
+        end_date: date,
+        train_missing: bool = True
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Returns, per employee, the predicted attendance probability (0 to 100)
+        for each day of the range, or None if there is no history to learn from.
+
+        With `train_missing` False, backends with per-employee models also
+        return None for employees that have no model yet, and train those in
+        the background instead of before returning.
+        """
+        raise NotImplementedError
+
+
+class ProphetForecaster(AttendanceForecaster):
+    """Accurate backend: one Prophet model per employee from the model store."""
+
+    name = "prophet"
+
+    def predict_range(self, db, employee_ids, start_date, end_date, train_missing=True):
+        # Imported here because the model store and the training job themselves train with create_prophet_model
+        from prophet_store import prophet_models
+        from prophet_training import training_job
+
+        predictions = []
+        untrained = []
+        for employee_id in employee_ids:
+            try:
+                model = prophet_models.get_model(db, employee_id=employee_id, train_missing=train_missing)
+            except ValueError:
+                predictions.append(None)  # No attendance history to train on
+                continue
+            if model is None:
+                untrained.append(employee_id)
+                predictions.append(None)
+                continue
+            predictions.append(predict_attendance_range(model, start_date, end_date))
+
+        if untrained:
+            training_job.enqueue(untrained)
+        return predictions
+
+
+class SeasonalRateForecaster(AttendanceForecaster):
+    """
+    Fast baseline: exponentially weighted presence rates per weekday and per
+    month, combined multiplicatively and shrunk towards each employee's
+    overall rate. Weekends and calendar holidays predict 0. All employees are
+    fitted and predicted together with NumPy, with no per-employee model.
+
+    Args:
+        half_life_days (float): Age at which a record's weight halves.
+        prior_strength (float): Pseudo-observations pulling sparse weekday
+                                and month cells towards the overall rate.
+    """
+
+    name = "baseline"
+
+    def __init__(self, half_life_days: float = 90.0, prior_strength: float = 5.0):
+        self.half_life_days = half_life_days
+        self.prior_strength = prior_strength
+
+    def _load_history(self, db: Session, employee_ids: List[Optional[int]]) -> pd.DataFrame:
+        return load_attendance(
+            db,
+            ['employee_id', 'date', 'status'],
+            employee_ids=None if None in employee_ids else employee_ids,
+            statuses=['present', 'leave']  # Holiday records carry no signal
+        )
+
+    def predict_range(self, db, employee_ids, start_date, end_date, train_missing=True):
+        history = self._load_history(db, employee_ids)
+
+        # Row i of every matrix below is employee_ids[i]; the aggregate gets every record
+        rows = {employee_id: i for i, employee_id in enumerate(employee_ids)}
+        codes = history['employee_id'].map(rows)
+        frames = [history.assign(row=codes)]
+        if None in rows:
+            frames.append(history.assign(row=rows[None]))
+        history = pd.concat(frames, ignore_index=True).dropna(subset=['row'])
+
+        n_rows = len(employee_ids)
+        row = history['row'].to_numpy(dtype=int)
+        days = pd.to_datetime(history['date'])
+        dow = days.dt.dayofweek.to_numpy()
+        month = days.dt.month.to_numpy() - 1
+        y = (history['status'] == 'present').to_numpy(dtype=float)
+
+        # Exponential decay by age relative to the latest record
+        age = (days.max() - days).dt.days.to_numpy() if len(days) else np.zeros(0)
+        w = np.power(0.5, age / self.half_life_days)
+
+        weight_total = np.bincount(row, weights=w, minlength=n_rows)
+        present_total = np.bincount(row, weights=w * y, minlength=n_rows)
+        has_history = weight_total > 0
+        overall = np.divide(present_total, weight_total, out=np.zeros(n_rows), where=has_history)
+
+        def cell_rates(cell, n_cells):
+            index = row * n_cells + cell
+            weight = np.bincount(index, weights=w, minlength=n_rows * n_cells).reshape(n_rows, n_cells)
+            present = np.bincount(index, weights=w * y, minlength=n_rows * n_cells).reshape(n_rows, n_cells)
+            prior = self.prior_strength * overall[:, None]
+            return (present + prior) / (weight + self.prior_strength)
+
+        dow_rates = cell_rates(dow, 7)
+        month_rates = cell_rates(month, 12)
+
+        future = pd.date_range(start_date, end_date, freq='D')
+        future_dow = future.dayofweek.to_numpy()
+        future_month = future.month.to_numpy() - 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = dow_rates[:, future_dow] * month_rates[:, future_month] / overall[:, None]
+        rates = np.nan_to_num(np.clip(rates, 0, 1))
+
+        rates[:, _closed_days(future, start_date, end_date)] = 0
+
+        return [rates[i] * 100 if has_history[i] else None for i in range(n_rows)]
+
+
+FORECASTERS = {
+    forecaster.name: forecaster
+    for forecaster in (ProphetForecaster(), SeasonalRateForecaster())
+}
+
+
+def get_forecaster(name: Optional[str] = None) -> AttendanceForecaster:
+    """
+    Returns the forecaster registered under `name`, defaulting to
+    PREDICTION_FORECASTER from the settings.
+
+    Raises:
+        ValueError: If no forecaster has that name.
+    """
+    name = name or settings.PREDICTION_FORECASTER
+    if name not in FORECASTERS:
+        raise ValueError(f"Unknown forecaster '{name}'. Choose one of: {', '.join(FORECASTERS)}")
+    return FORECASTERS[name]
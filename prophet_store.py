@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from prophet import Prophet
+from prophet.serialize import model_from_json, model_to_json
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, upsert
+from model_registry import ModelRegistry
+from models import Attendance, AttendanceUpdateCounter
+from prophet_attendance import create_prophet_model
+
+ALL_EMPLOYEES_KEY = "all"
+# Bump when the training data changes meaning, so models saved by older code are retrained
+MODEL_FORMAT_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+
+def model_key(employee_id: Optional[int]) -> str:
+    return str(employee_id) if employee_id else ALL_EMPLOYEES_KEY
+
+
+def data_watermark(db: Session, employee_id: Optional[int] = None) -> tuple:
+    """Returns (max attendance id, row count, update counter) of the data a model would be trained on."""
+    query = db.query(func.max(Attendance.id), func.count(Attendance.id))
+    if employee_id:
+        query = query.filter(Attendance.employee_id == employee_id)
+    max_id, row_count = query.one()
+    updates = db.query(AttendanceUpdateCounter.version).filter(
+        AttendanceUpdateCounter.employee_id == (employee_id or AttendanceUpdateCounter.ALL_EMPLOYEES)
+    ).scalar()
+    return (max_id, row_count, updates or 0)
+
+
+def mark_employees_updated(db: Session, employee_ids: Iterable[int]):
+    """
+    Bumps the update counters of `employee_ids` and of all employees, so
+    their models are retrained after records were changed in place.
+
+    Must be called in the same transaction that updates the records.
+    """
+    employee_ids = sorted(set(employee_ids))
+    if not employee_ids:
+        return
+    db.execute(
+        upsert(db, AttendanceUpdateCounter, ['employee_id'], update=lambda _: {'version': AttendanceUpdateCounter.version + 1}),
+        [{'employee_id': employee_id, 'version': 1} for employee_id in [AttendanceUpdateCounter.ALL_EMPLOYEES, *employee_ids]]
+    )
+
+
+class ProphetModelStore:
+    """
+    Fitted Prophet models serialized to disk and cached in an in-memory LRU.
+
+    Models are keyed by employee id (or "all" for the aggregate model) and
+    tagged with the data watermark they were trained on. A request that finds
+    a model trained on older data is answered with it while a background
+    thread retrains; only the very first request for a key trains inline.
+    """
+
+    def __init__(self, model_dir: str, max_bytes: int):
+        self.model_dir = model_dir
+        self._memory = ModelRegistry(max_bytes=max_bytes)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prophet-retrain")
+        self._pending = set()
+        self._training_locks = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.model_dir, f"{key}.json")
+
+    def _load_from_disk(self, key: str) -> Optional[tuple]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        with open(path) as f:
+            payload = json.load(f)
+        if payload.get("version") != MODEL_FORMAT_VERSION:
+            return None
+        serialized = payload["model"]
+        watermark = tuple(payload["watermark"])
+        model = model_from_json(serialized)
+        self._memory.put(key, watermark, model, nbytes=len(serialized))
+        return watermark, model
+
+    def _write(self, key: str, watermark: tuple, serialized: str):
+        os.makedirs(self.model_dir, exist_ok=True)
+        # A unique name per writer, so concurrent saves of one key never write into the same file
+        with tempfile.NamedTemporaryFile("w", dir=self.model_dir, prefix=f"{key}.", suffix=".tmp", delete=False) as f:
+            json.dump({"version": MODEL_FORMAT_VERSION, "watermark": list(watermark), "model": serialized}, f)
+        try:
+            os.replace(f.name, self._path(key))  # Atomic, so readers never see a partial file
+        except OSError:
+            os.remove(f.name)
+            raise
+
+    def save(self, employee_id: Optional[int], watermark: tuple, model: Prophet):
+        key = model_key(employee_id)
+        serialized = model_to_json(model)
+        self._write(key, watermark, serialized)
+        self._memory.put(key, watermark, model, nbytes=len(serialized))
+
+    def save_serialized(self, employee_id: Optional[int], watermark: tuple, serialized: str):
+        """Stores a model serialized elsewhere (e.g. in a training worker process); it is loaded lazily."""
+        key = model_key(employee_id)
+        self._write(key, watermark, serialized)
+        self._memory.discard(key)
+
+    def train(self, db: Session, employee_id: Optional[int] = None) -> Prophet:
+        watermark = data_watermark(db, employee_id)
+        model = create_prophet_model(employee_id=employee_id, db=db)
+        self.save(employee_id, watermark, model)
+        return model
+
+    def _retrain(self, employee_id: Optional[int]):
+        key = model_key(employee_id)
+        db = SessionLocal()
+        try:
+            self.train(db, employee_id)
+        except Exception:
+            logger.exception("Error retraining Prophet model %s", key)
+        finally:
+            db.close()
+            with self._lock:
+                self._pending.discard(key)
+
+    def schedule_retrain(self, employee_id: Optional[int] = None):
+        key = model_key(employee_id)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._retrain, employee_id)
+
+    def _training_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._training_locks.setdefault(key, threading.Lock())
+
+    def _train_cold(self, db: Session, employee_id: Optional[int]) -> Prophet:
+        """Trains a key that has no model yet; concurrent requests for it wait for one training instead of each running it."""
+        key = model_key(employee_id)
+        with self._training_lock(key):
+            cached = self._memory.peek(key) or self._load_from_disk(key)
+            if cached is not None:
+                return cached[1]
+            return self.train(db, employee_id)
+
+    def get_model(self, db: Session, employee_id: Optional[int] = None, train_missing: bool = True) -> Optional[Prophet]:
+        """
+        Returns a fitted model for the employee (or all employees).
+
+        Args:
+            train_missing (bool): Train the model before returning if there is
+                                  none yet. If False, None is returned instead
+                                  and the caller schedules the training.
+
+        Raises:
+            ValueError: If there is no attendance data to train on.
+        """
+        key = model_key(employee_id)
+        watermark = data_watermark(db, employee_id)
+
+        model = self._memory.get(key, watermark)
+        if model is not None:
+            return model
+
+        cached = self._memory.peek(key) or self._load_from_disk(key)
+        if cached is None:
+            if not train_missing:
+                if not watermark[1]:
+                    raise ValueError("No attendance records found for the given employee ID.")
+                return None
+            return self._train_cold(db, employee_id)
+
+        cached_watermark, model = cached
+        if cached_watermark != watermark:
+            # Serve the previous model while the new data is trained on in the background
+            self.schedule_retrain(employee_id)
+        return model
+
+
+prophet_models = ProphetModelStore(
+    model_dir=settings.PROPHET_MODEL_DIR,
+    max_bytes=settings.PROPHET_MODEL_CACHE_MAX_BYTES
+)
@@ -0,0 +1,229 @@
+import argparse
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from prophet.serialize import model_to_json
+
+from config import settings
+from database import SessionLocal, engine, Base
+from models import Employee
+from prophet_attendance import create_prophet_model
+from prophet_store import data_watermark, model_key, prophet_models
+
+logger = logging.getLogger(__name__)
+
+
+def _train_one(employee_id: Optional[int]) -> dict:
+    """
+    Trains and serializes one model. Runs inside a worker process, so it
+    opens its own session and never raises: failures are reported in the result.
+    """
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        watermark = data_watermark(db, employee_id)
+        model = create_prophet_model(employee_id=employee_id, db=db)
+        return {
+            "employee_id": employee_id,
+            "watermark": watermark,
+            "model_json": model_to_json(model),
+            "seconds": round(time.perf_counter() - started, 3),
+            "error": None
+        }
+    except Exception as e:
+        return {
+            "employee_id": employee_id,
+            "watermark": None,
+            "model_json": None,
+            "seconds": round(time.perf_counter() - started, 3),
+            "error": str(e)
+        }
+    finally:
+        db.close()
+
+
+def all_model_ids() -> List[Optional[int]]:
+    """Every employee id plus None for the all-employee aggregate model."""
+    db = SessionLocal()
+    try:
+        employee_ids = [employee_id for employee_id, in db.query(Employee.employee_id).order_by(Employee.employee_id)]
+    finally:
+        db.close()
+    return employee_ids + [None]
+
+
+def train_models(
+    employee_ids: Optional[List[Optional[int]]] = None,
+    workers: Optional[int] = None,
+    on_result: Optional[Callable[[dict, int, int], None]] = None
+) -> List[dict]:
+    """
+    Trains Prophet models in a process pool and writes them to the model store.
+
+    Args:
+        employee_ids (Optional[List[Optional[int]]]): Models to train, None meaning
+                                                      the all-employee aggregate.
+                                                      Defaults to every employee
+                                                      and the aggregate.
+        workers (Optional[int]): Worker processes. Defaults to PROPHET_TRAINING_WORKERS.
+        on_result (Optional[Callable]): Called with (result, completed, total)
+                                        as each model finishes.
+
+    Returns:
+        List[dict]: Per-model results with employee_id, seconds and error.
+    """
+    if employee_ids is None:
+        employee_ids = all_model_ids()
+    workers = workers or settings.PROPHET_TRAINING_WORKERS
+
+    results = []
+    # spawn, so workers never inherit the parent's threads or pooled connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(_train_one, employee_id): employee_id for employee_id in employee_ids}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # The worker process itself died
+                result = {"employee_id": futures[future], "seconds": None, "error": str(e)}
+
+            model_json = result.pop("model_json", None)
+            watermark = result.pop("watermark", None)
+            if model_json is not None:
+                prophet_models.save_serialized(result["employee_id"], tuple(watermark), model_json)
+
+            results.append(result)
+            if on_result:
+                on_result(result, len(results), len(employee_ids))
+
+    return results
+
+
+class TrainingJob:
+    """
+    Progress of the most recent training run started through the API. Models
+    queued while a run is in progress are trained by that run once its
+    current models are done.
+    """
+
+    def __init__(self):
+        self.status = "idle"
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.started_at = None
+        self.finished_at = None
+        self.results = []
+        self._queued = set()  # Every model of the current run, so none is queued twice
+        self._waiting = set()  # Models of the current run that have not finished
+        self._pending = []  # Queued after the run started, not yet handed to train_models
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "status": self.status,
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "results": list(self.results)
+            }
+
+    def _record(self, result: dict, completed: int, total: int):
+        with self._lock:
+            self.completed += 1
+            self._waiting.discard(result["employee_id"])
+            self.failed += result["error"] is not None
+            self.results.append(result)
+
+    def _run(self, employee_ids, workers):
+        status = "completed"
+        while True:
+            try:
+                if employee_ids:
+                    train_models(employee_ids, workers, on_result=self._record)
+            except Exception:
+                logger.exception("Error training Prophet models")
+                status = "failed"
+            with self._lock:
+                employee_ids, self._pending = self._pending, []
+                if not employee_ids:
+                    self.status = status
+                    self.finished_at = datetime.utcnow()
+                    self._queued = set()
+                    self._waiting = set()
+                    return
+
+    def _begin(self, employee_ids: List[Optional[int]], workers: Optional[int]):
+        # Called with the lock held
+        self.status = "running"
+        self.total = len(employee_ids)
+        self.completed = 0
+        self.failed = 0
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+        self.results = []
+        self._queued = set(employee_ids)
+        self._waiting = set(employee_ids)
+        self._pending = []
+        threading.Thread(target=self._run, args=(employee_ids, workers), daemon=True).start()
+
+    def start(self, employee_ids: Optional[List[Optional[int]]] = None, workers: Optional[int] = None) -> bool:
+        """Starts a run in a background thread; returns False if one is already running."""
+        if employee_ids is None:
+            employee_ids = all_model_ids()
+
+        with self._lock:
+            if self.status == "running":
+                return False
+            self._begin(employee_ids, workers)
+        return True
+
+    def enqueue(self, employee_ids: List[Optional[int]]):
+        """Trains the models in the background: in a new run, or after the models of the run in progress."""
+        employee_ids = list(dict.fromkeys(employee_ids))
+        with self._lock:
+            if self.status != "running":
+                self._begin(employee_ids, None)
+                return
+            queued = [employee_id for employee_id in employee_ids if employee_id not in self._queued]
+            self._queued.update(queued)
+            self._waiting.update(queued)
+            self._pending.extend(queued)
+            self.total += len(queued)
+
+    def is_queued(self, employee_id: Optional[int]) -> bool:
+        """Whether the run in progress has yet to finish training the model."""
+        with self._lock:
+            return employee_id in self._waiting
+
+
+training_job = TrainingJob()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train Prophet attendance models for the whole workforce.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: PROPHET_TRAINING_WORKERS or CPU count)")
+    parser.add_argument("--employee-ids", type=int, nargs="*", default=None, help="Only train these employees")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+
+    def report(result, completed, total):
+        name = model_key(result["employee_id"])
+        if result["error"]:
+            print(f"[{completed}/{total}] {name}: failed after {result['seconds']}s - {result['error']}")
+        else:
+            print(f"[{completed}/{total}] {name}: trained in {result['seconds']}s")
+
+    results = train_models(args.employee_ids, args.workers, on_result=report)
+    failed = sum(result["error"] is not None for result in results)
+    print(f"Trained {len(results) - failed}/{len(results)} models in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,307 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import date
+from typing import Any, Awaitable, Callable, FrozenSet, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from config import settings
+
+RECENT_INVALIDATIONS = 1024  # Writes remembered for checking responses computed while they committed
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Whether an If-None-Match header lists `etag` or is "*"; weak (W/) tags match by weak comparison."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CacheEntry:
+    """
+    One rendered response body and its headers, with what it was computed from: the data
+    `sources` it reads ("attendance", "employees", "holidays", "anomalies") and,
+    for date-bounded responses, the range of attendance dates it covers.
+    """
+
+    def __init__(self, body: bytes, headers: dict, sources: FrozenSet[str], start_date: Optional[date], end_date: Optional[date], expires_at: float):
+        self.body = body
+        self.headers = headers
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.sources = sources
+        self.start_date = start_date
+        self.end_date = end_date
+        self.expires_at = expires_at
+
+    def depends_on(self, source: str, start_date: Optional[date], end_date: Optional[date]) -> bool:
+        """Whether a write to `source` between the two dates (None: unbounded) can change this entry."""
+        if source not in self.sources:
+            return False
+        if None in (start_date, end_date, self.start_date, self.end_date):
+            return True
+        return start_date <= self.end_date and self.start_date <= end_date
+
+
+class CacheBackend:
+    """
+    Storage for cache entries. Implementations must be thread-safe: reads
+    happen on the event loop and invalidations in worker threads.
+    """
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Returns the live entry for `key`, or None if it is missing or expired."""
+        raise NotImplementedError
+
+    def set(self, key: str, entry: CacheEntry) -> int:
+        """Stores an entry and returns how many others were evicted to make room."""
+        raise NotImplementedError
+
+    def items(self) -> List[Tuple[str, CacheEntry]]:
+        raise NotImplementedError
+
+    def delete(self, keys: Iterable[str]):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU with per-entry expiry. Each worker process has its own,
+    and invalidations only reach the process that made the write.
+
+    Args:
+        max_entries (int): Least recently used entries are evicted beyond this.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.expired = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> int:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def items(self) -> List[Tuple[str, CacheEntry]]:
+        with self._lock:
+            return list(self._entries.items())
+
+    def delete(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+CACHE_BACKENDS = {
+    "memory": lambda: MemoryCacheBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+}
+
+
+def get_cache_backend(name: Optional[str] = None) -> CacheBackend:
+    """
+    Creates the backend registered under `name`, defaulting to
+    RESPONSE_CACHE_BACKEND from the settings.
+
+    Raises:
+        ValueError: If no backend has that name.
+    """
+    name = name or settings.RESPONSE_CACHE_BACKEND
+    if name not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown cache backend '{name}'. Choose one of: {', '.join(CACHE_BACKENDS)}")
+    return CACHE_BACKENDS[name]()
+
+
+def _render(value, response_type=None) -> bytes:
+    """Serializes a handler result the way FastAPI would for the same response model."""
+    if response_type is not None:
+        adapter = TypeAdapter(response_type)
+        value = adapter.dump_python(adapter.validate_python(value), mode="json")
+    return JSONResponse(jsonable_encoder(value)).body
+
+
+class ResponseCache:
+    """
+    Caches rendered JSON responses of read-heavy endpoints, keyed by the
+    endpoint and its normalized query parameters.
+
+    Writes call `invalidate` after they commit, dropping only the entries
+    that read the written source and, for attendance, overlap the written
+    dates; the TTL bounds staleness from writes made by other processes.
+    Every response carries an ETag, and requests whose If-None-Match
+    matches get an empty 304.
+
+    Args:
+        backend (CacheBackend): Entry storage.
+        ttl (float): Seconds an entry is served before it is recomputed.
+        enabled (bool): When False nothing is stored, but ETags and 304s still work.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._sequence = 0  # Invalidations so far
+        self._recent = deque(maxlen=RECENT_INVALIDATIONS)  # (sequence, source, start_date, end_date)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def make_key(namespace: str, params: dict) -> str:
+        normalized = sorted(
+            (name, value.isoformat() if isinstance(value, date) else str(value))
+            for name, value in params.items() if value is not None
+        )
+        return f"{namespace}?{urlencode(normalized)}"
+
+    async def respond(
+        self,
+        request: Request,
+        namespace: str,
+        params: dict,
+        compute: Callable[[], Awaitable],
+        sources: Iterable[str],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        response_type=None,
+        headers: Optional[Callable[[Any], dict]] = None
+    ) -> Response:
+        """
+        Returns the cached response for `params`, computing and storing it on a miss.
+
+        Args:
+            request (Request): Incoming request, for If-None-Match.
+            namespace (str): Endpoint name, the first part of the key.
+            params (dict): Query parameters after defaults are applied.
+            compute (Callable): Coroutine function producing the handler result.
+            sources (Iterable[str]): Data the result is computed from; see `CacheEntry`.
+            start_date (Optional[date]): First attendance date the result covers, if bounded.
+            end_date (Optional[date]): Last attendance date the result covers, if bounded.
+            response_type: Response model used to serialize the result, if any.
+            headers (Optional[Callable]): Returns extra response headers for a result, cached with its body.
+        """
+        key = self.make_key(namespace, params)
+        entry = self.backend.get(key) if self.enabled else None
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            sequence = self._sequence
+            value = await compute()
+            entry = CacheEntry(
+                _render(value, response_type), headers(value) if headers else {},
+                frozenset(sources), start_date, end_date, time.monotonic() + self.ttl
+            )
+            with self._lock:
+                # A write committed while computing may not be reflected in the body
+                if self.enabled and not self._invalidated_since(sequence, entry):
+                    self.evictions += self.backend.set(key, entry)
+
+        response_headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(entry.etag, request.headers.get("if-none-match")):
+            self.not_modified += 1
+            return Response(status_code=304, headers=response_headers)
+        return Response(content=entry.body, media_type="application/json", headers=response_headers)
+
+    def _invalidated_since(self, sequence: int, entry: CacheEntry) -> bool:
+        """Whether a write `entry` depends on was invalidated after `sequence`; call with the lock held."""
+        if self._sequence - sequence > len(self._recent):
+            return True  # Some of those writes are no longer remembered, so assume one was relevant
+        return any(
+            entry.depends_on(source, start_date, end_date)
+            for written, source, start_date, end_date in self._recent if written > sequence
+        )
+
+    def invalidate(self, source: str, start_date: Optional[date] = None, end_date: Optional[date] = None) -> int:
+        """
+        Drops the entries a committed write to `source` can change.
+
+        Args:
+            source (str): "attendance", "employees", "holidays" or "anomalies".
+            start_date (Optional[date]): First date written. None with `end_date` None means any date.
+            end_date (Optional[date]): Last date written.
+
+        Returns:
+            int: Number of entries dropped.
+        """
+        with self._lock:
+            self._sequence += 1
+            self._recent.append((self._sequence, source, start_date, end_date))
+            stale = [
+                key for key, entry in self.backend.items()
+                if entry.depends_on(source, start_date, end_date)
+            ]
+            self.backend.delete(stale)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def invalidate_days(self, source: str, days: Iterable[date]) -> int:
+        """`invalidate` for the range spanning `days`; does nothing if there are none."""
+        days = list(days)
+        if not days:
+            return 0
+        return self.invalidate(source, min(days), max(days))
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": getattr(self.backend, "expired", None),
+            "invalidations": self.invalidations,
+            "not_modified": self.not_modified
+        }
+
+
+response_cache = ResponseCache(
+    backend=get_cache_backend(),
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    enabled=settings.RESPONSE_CACHE_ENABLED
+)
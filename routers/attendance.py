@@ -1,58 +1,242 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from database import get_db
+from typing import List, Literal, Optional
+from database import get_db, get_async_db, SessionLocal
 from models import Attendance
 from schemas import schemas
-from datetime import date
+from attendance_rollup import apply_attendances
+from attendance_summary import apply_attendance_summaries
+from attendance_snapshot import mark_months_changed
+from attendance_ingest import TooManyRecords, ingest_attendance, parse_attendance_payload
+from checkin_queue import QueueFull, checkin_queue
+from response_cache import response_cache
+from config import settings
+from prophet_attendance import get_forecaster
+from prophet_training import training_job, all_model_ids
+from datetime import date, timedelta
+import numpy as np
 
 router = APIRouter(
     prefix="/attendance",
     tags=["attendance"]
 )
 
+MAX_PREDICTION_DAYS = 366
+STREAM_CHUNK_ROWS = 1000
+MAX_BULK_ROWS = 50000
+MAX_BULK_BYTES = MAX_BULK_ROWS * 512  # Far above the size of a record in any of the accepted formats
+
 @router.post("/", response_model=schemas.Attendance)
 def create_attendance(attendance: schemas.AttendanceCreate, db: Session = Depends(get_db)):
     db_attendance = Attendance(**attendance.dict())
     db.add(db_attendance)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        exists = db.query(Attendance.id).filter(
+            Attendance.employee_id == attendance.employee_id, Attendance.date == attendance.date
+        ).first()
+        if exists is None:
+            raise
+        raise HTTPException(status_code=409, detail="Attendance for this employee and date already exists; use /attendance/bulk to update it")
+    apply_attendances(db, [db_attendance])
+    apply_attendance_summaries(db, [db_attendance])
+    mark_months_changed(db, [db_attendance.date])
     db.commit()
     db.refresh(db_attendance)
+    response_cache.invalidate("attendance", db_attendance.date, db_attendance.date)
     return db_attendance
 
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    """Reads the request body, answering 413 as soon as it grows past `max_bytes`."""
+    too_large = HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes")
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    return bytes(body)
+
+@router.post("/bulk", response_model=schemas.BulkAttendanceResult, description="Upserts many attendance records by (employee_id, date) in one transaction.")
+async def create_attendance_bulk(request: Request, db: Session = Depends(get_db)):
+    """
+    Accepts a JSON array, NDJSON or CSV body (by Content-Type). Invalid rows
+    are reported per row and skipped; the rest are written together.
+    """
+    body = await _read_body(request, MAX_BULK_BYTES)
+    try:
+        rows = parse_attendance_payload(body, request.headers.get("content-type"), max_rows=MAX_BULK_ROWS)
+    except TooManyRecords as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not rows:
+        raise HTTPException(status_code=400, detail="No attendance records in the request body")
+
+    # The write is blocking, so keep it off the event loop
+    return await run_in_threadpool(ingest_attendance, db, rows)
+
+@router.post("/checkin", response_model=schemas.CheckinResult, description="Records a check-in through the write-behind queue.")
+async def queue_checkin(
+    attendance: schemas.AttendanceCreate,
+    response: Response,
+    durability: Literal["confirmed", "buffered"] = Query(
+        default=settings.CHECKIN_DURABILITY,
+        description="'confirmed' answers once the record is committed and readable; 'buffered' answers 202 once it is queued."
+    )
+):
+    """
+    Check-ins are written in micro-batches with others arriving at the same
+    time instead of one transaction each.
+    """
+    wait = durability == "confirmed"
+    try:
+        outcome = await checkin_queue.submit(attendance.model_dump(), wait=wait)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    if not wait:
+        response.status_code = 202
+        return {"durability": durability, "result": "queued"}
+    if outcome["result"] == "rejected":
+        raise HTTPException(status_code=400, detail=outcome["error"])
+    return {"durability": durability, **outcome}
+
+@router.get("/checkin/metrics", response_model=schemas.CheckinQueueMetrics, description="Depth and flush latency of the check-in queue.")
+def get_checkin_queue_metrics():
+    return checkin_queue.metrics()
+
+def _parse_cursor(cursor: str) -> tuple:
+    """Cursors are "<date>:<id>" of the last record on the previous page."""
+    try:
+        day, record_id = cursor.split(":")
+        return date.fromisoformat(day), int(record_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _attendance_page(query, response: Response, cursor: Optional[str], limit: int, descending: bool = False):
+    """
+    Returns one page of a query over Attendance, keyset-paginated on (date, id)
+    so deep pages cost the same as the first. The cursor for the next page is
+    sent in the X-Next-Cursor header when more records may follow.
+    """
+    key = tuple_(Attendance.date, Attendance.id)
+    if cursor:
+        after = tuple_(*_parse_cursor(cursor))
+        query = query.filter(key < after if descending else key > after)
+
+    if descending:
+        query = query.order_by(Attendance.date.desc(), Attendance.id.desc())
+    else:
+        query = query.order_by(Attendance.date, Attendance.id)
+
+    records = query.limit(limit).all()
+    if len(records) == limit:
+        last = records[-1]
+        response.headers["X-Next-Cursor"] = f"{last.date.isoformat()}:{last.id}"
+    return records
+
+def _stream_attendance(filters: tuple, descending: bool = False) -> StreamingResponse:
+    """
+    Streams every matching record as NDJSON, one object per line, reading
+    STREAM_CHUNK_ROWS rows at a time so the full history is never held in memory.
+    """
+    def chunks():
+        # Own session: the request's session is closed before the body is sent
+        db = SessionLocal()
+        try:
+            order = (Attendance.date.desc(), Attendance.id.desc()) if descending else (Attendance.date, Attendance.id)
+            result = db.execute(
+                select(
+                    Attendance.id,
+                    Attendance.employee_id,
+                    Attendance.date,
+                    Attendance.checkin_time,
+                    Attendance.checkout_time,
+                    Attendance.status
+                ).where(*filters).order_by(*order).execution_options(yield_per=STREAM_CHUNK_ROWS)
+            )
+            # One body chunk per batch of rows keeps the per-message overhead low
+            for rows in result.partitions():
+                yield "".join(
+                    schemas.Attendance.model_validate(row._asdict()).model_dump_json() + "\n" for row in rows
+                )
+        finally:
+            db.close()
+
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
 @router.get("/", response_model=List[schemas.Attendance])
-def get_attendance(employee_id: int, db: Session = Depends(get_db)):
+def get_attendance(
+    employee_id: int,
+    response: Response,
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor header of the previous page."),
+    limit: int = Query(default=100, ge=1, le=1000),
+    stream: bool = Query(default=False, description="Stream every record as NDJSON instead of returning one page."),
+    db: Session = Depends(get_db)
+):
     """
-    Retrieve all attendance records for a specific employee.
+    Retrieve attendance records for a specific employee, oldest first.
     """
     if employee_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid employee ID")
 
-    attendance_records = db.query(Attendance).filter(Attendance.employee_id == employee_id).all()
+    filters = (Attendance.employee_id == employee_id,)
+    if stream:
+        return _stream_attendance(filters)
+
+    attendance_records = _attendance_page(db.query(Attendance).filter(*filters), response, cursor, limit)
 
-    if not attendance_records:
+    if not attendance_records and not cursor:
         raise HTTPException(status_code=404, detail="No attendance records found for this employee")
 
     return attendance_records
 
+def _employee_attendance_filters(employee_id: int, start_date: Optional[date], end_date: Optional[date]) -> tuple:
+    filters = [Attendance.employee_id == employee_id]
+    if start_date:
+        filters.append(Attendance.date >= start_date)
+    if end_date:
+        filters.append(Attendance.date <= end_date)
+    return tuple(filters)
+
 @router.get("/employee/{employee_id}", response_model=List[schemas.Attendance])
-def get_employee_attendance(
+async def get_employee_attendance(
     employee_id: int,
+    response: Response,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor header of the previous page."),
+    limit: int = Query(default=100, ge=1, le=1000),
+    stream: bool = Query(default=False, description="Stream every record as NDJSON instead of returning one page."),
+    db=Depends(get_async_db)
 ):
+    """
+    Retrieve an employee's attendance records, newest first.
+    """
     if employee_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid employee ID")
 
-    query = db.query(Attendance).filter(Attendance.employee_id == employee_id)
-    
-    if start_date:
-        query = query.filter(Attendance.date >= start_date)
-    if end_date:
-        query = query.filter(Attendance.date <= end_date)
-        
-    result = query.order_by(Attendance.date.desc()).all()
-    if not result:
+    filters = _employee_attendance_filters(employee_id, start_date, end_date)
+    if stream:
+        return _stream_attendance(filters, descending=True)
+
+    result = await db.run_sync(
+        lambda session: _attendance_page(
+            session.query(Attendance).filter(*filters), response, cursor, limit, descending=True
+        )
+    )
+    if not result and not cursor:
         raise HTTPException(status_code=404, detail="No attendance records found")
         
     return result
@@ -61,6 +245,7 @@ def get_employee_attendance(
 def predict_employee_attendance(
     employee_id: Optional[int] = None,
     prediction_date: date = Query(..., description="Date to predict attendance for (YYYY-MM-DD)."),
+    forecaster: Optional[str] = Query(default=None, description="Forecasting backend: 'prophet' or the fast 'baseline'. Defaults to the configured one."),
     db: Session = Depends(get_db)
 ):
     """
@@ -68,11 +253,79 @@ def predict_employee_attendance(
     If no employee_id is provided, predicts the average attendance.
     """
     try:
-        model = create_prophet_model(employee_id=employee_id, db=db)
-        attendance_probability = predict_attendance(model, prediction_date)
+        backend = get_forecaster(forecaster)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        prediction = backend.predict_range(db, [employee_id], prediction_date, prediction_date)[0]
+        if prediction is None:
+            raise ValueError("No attendance records found for the given employee ID.")
+        attendance_probability = float(prediction[0])
         return {"employee_id": employee_id, "date": prediction_date, "predicted_attendance_percentage": round(attendance_probability, 2)}
 
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+@router.post("/predict/batch", response_model=schemas.BatchPredictionResponse, description="Predicts attendance percentages for many employees over a date range.")
+def predict_attendance_batch(request: schemas.BatchPredictionRequest, db: Session = Depends(get_db)):
+    """
+    Returns a dense employees x dates matrix of predicted attendance percentages,
+    predicting each employee's whole range in one call. Employees without a
+    trained model yet get null rows and are listed in training_employee_ids
+    while it trains in the background.
+    """
+    if not request.employee_ids:
+        raise HTTPException(status_code=400, detail="At least one employee ID is required")
+    if any(employee_id <= 0 for employee_id in request.employee_ids):
+        raise HTTPException(status_code=400, detail="Invalid employee ID")
+    if request.start_date > request.end_date:
+        raise HTTPException(status_code=400, detail="Start date cannot be after end date")
+
+    days = (request.end_date - request.start_date).days + 1
+    if days > MAX_PREDICTION_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {MAX_PREDICTION_DAYS} days")
+
+    try:
+        backend = get_forecaster(request.forecaster)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    employee_ids = list(dict.fromkeys(request.employee_ids))
+    try:
+        # Models are never fitted in the request; missing ones are queued on the training job
+        predictions = [
+            None if probabilities is None else np.round(probabilities, 2).tolist()
+            for probabilities in backend.predict_range(db, employee_ids, request.start_date, request.end_date, train_missing=False)
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+    return {
+        "employee_ids": employee_ids,
+        "dates": [request.start_date + timedelta(days=offset) for offset in range(days)],
+        "predicted_attendance_percentage": predictions,
+        "training_employee_ids": [
+            employee_id for employee_id, prediction in zip(employee_ids, predictions)
+            if prediction is None and training_job.is_queued(employee_id)
+        ]
+    }
+
+@router.post("/models/train", response_model=schemas.ModelTrainingStatus, status_code=202, description="Trains Prophet models for the whole workforce in the background.")
+def train_prediction_models(request: Optional[schemas.ModelTrainingRequest] = None):
+    request = request or schemas.ModelTrainingRequest()
+    employee_ids = request.employee_ids
+    if employee_ids is not None:
+        employee_ids = list(employee_ids) + ([None] if request.include_aggregate else [])
+    elif not request.include_aggregate:
+        employee_ids = [employee_id for employee_id in all_model_ids() if employee_id is not None]
+
+    if not training_job.start(employee_ids, request.workers):
+        raise HTTPException(status_code=409, detail="A training run is already in progress")
+    return training_job.snapshot()
+
+@router.get("/models/train", response_model=schemas.ModelTrainingStatus, description="Progress of the latest training run.")
+def get_training_status():
+    return training_job.snapshot()
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
-from typing import List
-from database import get_db
-from models import Employee, Attendance
+from sqlalchemy import func, select
+from typing import List, Optional
+from database import get_db, get_async_db
+from models import Employee, EmployeeAttendanceSummary
 from schemas import schemas
+from response_cache import response_cache
 
 router = APIRouter(
     prefix="/employees",
@@ -17,35 +18,83 @@ def create_employee(employee: schemas.EmployeeCreate, db: Session = Depends(get_
     db.add(db_employee)
     db.commit()
     db.refresh(db_employee)
+    response_cache.invalidate("employees")
     return db_employee
 
-@router.get("/", response_model=List[schemas.Employee])
-def get_employees(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    # Query employees with attendance statistics
-    employees = db.query(
-        Employee,
-        func.count(Attendance.id).label('total_attendance'),
-        func.sum(case((Attendance.status == 'present', 1), else_=0)).label('present_days')
+def _employee_select():
+    """Employee columns with the running attendance counters from their summary row."""
+    return select(
+        Employee.employee_id,
+        Employee.employee_name,
+        Employee.email,
+        Employee.department,
+        Employee.created_at,
+        func.coalesce(EmployeeAttendanceSummary.total, 0),
+        func.coalesce(EmployeeAttendanceSummary.present, 0),
+        EmployeeAttendanceSummary.last_checkin_time,
+        func.coalesce(EmployeeAttendanceSummary.current_present_streak, 0),
+        func.coalesce(EmployeeAttendanceSummary.longest_present_streak, 0)
     ).outerjoin(
-        Attendance, 
-        Employee.employee_id == Attendance.employee_id
-    ).group_by(
-        Employee.employee_id
-    ).offset(skip).limit(limit).all()
-    
-    # Format the response
-    result = []
-    for emp, total_attendance, present_days in employees:
-        emp_dict = emp.__dict__
-        emp_dict['total_working_days_after_joining'] = total_attendance
-        emp_dict['present_days'] = present_days
-        emp_dict['attendance_percentage'] = round((present_days / total_attendance * 100), 2) if total_attendance > 0 else 0
-        result.append(emp_dict)
-    return result
+        EmployeeAttendanceSummary,
+        EmployeeAttendanceSummary.employee_id == Employee.employee_id
+    )
+
+def _employee_dict(row) -> dict:
+    (employee_id, employee_name, email, department, created_at, total_attendance, present_days,
+     last_checkin_time, current_present_streak, longest_present_streak) = row
+    return {
+        "employee_id": employee_id,
+        "employee_name": employee_name,
+        "email": email,
+        "department": department,
+        "created_at": created_at,
+        "total_working_days_after_joining": total_attendance,
+        "present_days": present_days,
+        "attendance_percentage": round((present_days / total_attendance * 100), 2) if total_attendance > 0 else 0,
+        "last_checkin_time": last_checkin_time,
+        "current_present_streak": current_present_streak,
+        "longest_present_streak": longest_present_streak
+    }
+
+def _list_employees(db: Session, skip: int, limit: int, cursor: Optional[int] = None, department: Optional[str] = None) -> List[dict]:
+    """
+    Lists employees by employee_id (keyset on employee_id when a cursor is
+    given) with their attendance totals read from the per-employee summary,
+    so the cost depends on the page size only, not on attendance history.
+    """
+    query = _employee_select()
+    if cursor is not None:
+        query = query.where(Employee.employee_id > cursor)
+    if department is not None:
+        query = query.where(Employee.department == department)
+    rows = db.execute(query.order_by(Employee.employee_id).offset(skip).limit(limit))
+    return [_employee_dict(row) for row in rows]
+
+def _next_cursor(employees: List[dict], limit: int) -> dict:
+    return {"X-Next-Cursor": str(employees[-1]["employee_id"])} if len(employees) == limit else {}
+
+@router.get("/", response_model=List[schemas.Employee])
+async def get_employees(
+    request: Request,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[int] = Query(default=None, description="X-Next-Cursor of the previous page: list employees after this employee_id."),
+    department: Optional[str] = None,
+    db=Depends(get_async_db)
+):
+    return await response_cache.respond(
+        request,
+        "employees",
+        {"skip": skip, "limit": limit, "cursor": cursor, "department": department},
+        lambda: db.run_sync(_list_employees, skip, limit, cursor, department),
+        sources=("attendance", "employees"),
+        response_type=List[schemas.Employee],
+        headers=lambda employees: _next_cursor(employees, limit)
+    )
 
 @router.get("/{employee_id}", response_model=schemas.Employee) 
 def get_employee(employee_id: int, db: Session = Depends(get_db)):
-    employee = db.query(Employee).filter(Employee.employee_id == employee_id).first()
-    if not employee:
+    row = db.execute(_employee_select().where(Employee.employee_id == employee_id)).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Employee not found")
-    return employee
\ No newline at end of file
+    return _employee_dict(row)
\ No newline at end of file
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+import os
+from pydantic import BaseModel, Field
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 
 class EmployeeBase(BaseModel):
     employee_name: str
@@ -16,6 +17,9 @@ class Employee(EmployeeBase):
     total_working_days_after_joining: Optional[int] = None
     present_days: Optional[int] = None
     attendance_percentage: Optional[float] = None
+    last_checkin_time: Optional[datetime] = None
+    current_present_streak: Optional[int] = None  # Consecutive present records up to the latest one
+    longest_present_streak: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -50,4 +54,98 @@ class LeaveRequest(LeaveRequestBase):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class BatchPredictionRequest(BaseModel):
+    employee_ids: List[int] = Field(..., max_length=1000)
+    start_date: date
+    end_date: date
+    forecaster: Optional[str] = None  # "prophet" or "baseline"; defaults to the configured one
+
+class BatchPredictionResponse(BaseModel):
+    employee_ids: List[int]
+    dates: List[date]
+    # predicted_attendance_percentage[i][j] is employee_ids[i] on dates[j]; null rows have no attendance history or no model yet
+    predicted_attendance_percentage: List[Optional[List[float]]]
+    training_employee_ids: List[int] = []  # Their models are being trained in the background; retry for their rows
+
+class ModelTrainingRequest(BaseModel):
+    employee_ids: Optional[List[int]] = None  # Defaults to every employee
+    include_aggregate: bool = True  # Also train the all-employee model
+    workers: Optional[int] = Field(None, ge=1, le=os.cpu_count() or 1)  # Training processes; defaults to PROPHET_TRAINING_WORKERS
+
+class ModelTrainingResult(BaseModel):
+    employee_id: Optional[int] = None  # None is the all-employee model
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class ModelTrainingStatus(BaseModel):
+    status: str
+    total: int
+    completed: int
+    failed: int
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    results: List[ModelTrainingResult]
+
+class BulkAttendanceError(BaseModel):
+    row: int  # Zero-based position in the upload
+    employee_id: Optional[int]  # Null when the record could not be parsed
+    date: Optional[date]
+    error: str
+
+class BulkAttendanceResult(BaseModel):
+    received: int
+    inserted: int
+    updated: int
+    unchanged: int
+    errors: List[BulkAttendanceError]
+
+class CheckinResult(BaseModel):
+    durability: str
+    result: str  # "queued", "inserted", "updated", "unchanged" or "rejected"
+    error: Optional[str] = None
+
+class CheckinQueueMetrics(BaseModel):
+    running: bool
+    queue_depth: int
+    max_size: int
+    enqueued: int
+    rejected: int  # Refused because the queue stayed full
+    flushed: int
+    failed: int  # Rejected by validation or lost to a failed transaction
+    batches: int
+    last_flush_seconds: Optional[float] = None
+    avg_flush_seconds: Optional[float] = None
+    max_flush_seconds: float
+
+class DatabasePoolMetrics(BaseModel):
+    name: str  # "sync", or "async" when DATABASE_URL names an async driver
+    pool_class: Optional[str] = None
+    size: Optional[int] = None  # Only reported for queue pools
+    checked_out: int
+    checked_in: Optional[int] = None
+    overflow: Optional[int] = None
+    max_overflow: Optional[int] = None
+    connects: int
+    checkouts: int
+    invalidations: int
+    timeouts: int  # Checkouts that gave up after DB_POOL_TIMEOUT_SECONDS
+    avg_wait_ms: Optional[float] = None
+    max_wait_ms: float
+
+class ResponseCacheMetrics(BaseModel):
+    enabled: bool
+    backend: str
+    entries: int
+    hits: int
+    misses: int
+    evictions: int  # Least recently used entries dropped to stay within RESPONSE_CACHE_MAX_ENTRIES
+    expired: Optional[int] = None
+    invalidations: int  # Entries dropped by writes
+    not_modified: int  # 304 responses to If-None-Match
+
+class ServiceMetrics(BaseModel):
+    database_pools: List[DatabasePoolMetrics]
+    checkin_queue: CheckinQueueMetrics
+    response_cache: ResponseCacheMetrics
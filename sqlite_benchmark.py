@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import itertools
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import httpx
+
+MODES = {"default": "false", "tuned": "true"}  # SQLITE_TUNING_ENABLED per mode
+EMPLOYEES = 11  # Records are spread over employee ids 1..EMPLOYEES, which the sample database has
+FIRST_DAY = date(2031, 1, 1)  # After the sample data, so every record is new
+
+
+def copy_database(source: str, target: str):
+    """Copies a SQLite database, including committed pages still in its WAL, without writing to it."""
+    with sqlite3.connect(f"file:{source}?mode=ro", uri=True) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+def _record(n: int) -> dict:
+    day = FIRST_DAY + timedelta(days=n // EMPLOYEES)
+    return {"employee_id": n % EMPLOYEES + 1, "date": day.isoformat(),
+            "checkin_time": datetime(day.year, day.month, day.day, 9).isoformat(), "status": "present"}
+
+
+def _environment(database: str, tuning: str, workdir: str) -> dict:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database}",
+        "SQLITE_TUNING_ENABLED": tuning,
+        "ANOMALY_SCORING_INTERVAL_SECONDS": "0",
+        "PROPHET_MODEL_DIR": os.path.join(workdir, "prophet_models"),
+        "ATTENDANCE_SNAPSHOT_DIR": os.path.join(workdir, "attendance_snapshots")
+    }
+
+
+def measure_commits(commits: int) -> float:
+    """Ingests `commits` records one transaction each into DATABASE_URL; returns commits per second."""
+    from attendance_ingest import ingest_attendance
+    from database import Base, SessionLocal, engine
+    from migrations import run_migrations
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for n in range(commits):
+            ingest_attendance(db, [_record(n)])
+        return commits / (time.perf_counter() - started)
+    finally:
+        db.close()
+
+
+async def mixed_load(base_url: str, readers: int, writers: int, seconds: float) -> dict:
+    """
+    Runs `readers` clients cycling through read endpoints and `writers`
+    clients creating one attendance record per request, for `seconds`.
+
+    Returns:
+        dict: {"reads"/"writes": (requests per second, p50, p95, p99 ms, errors)}.
+    """
+    latencies = {"reads": [], "writes": []}
+    errors = {"reads": 0, "writes": 0}
+    numbers = itertools.count()
+    read_paths = ["/attendance-stats?target_date=2024-03-05", "/employees/"]
+
+    async def timed(kind: str, request):
+        started = time.perf_counter()
+        response = await request
+        latencies[kind].append(time.perf_counter() - started)
+        errors[kind] += response.status_code >= 400
+
+    async def reader(client: httpx.AsyncClient, index: int, deadline: float):
+        for n in itertools.count(index):
+            if time.perf_counter() >= deadline:
+                return
+            path = read_paths[n % 2] if n % 3 else f"/attendance/employee/{n % EMPLOYEES + 1}?limit=50"
+            await timed("reads", client.get(path))
+
+    async def writer(client: httpx.AsyncClient, deadline: float):
+        while time.perf_counter() < deadline:
+            await timed("writes", client.post("/attendance/", json=_record(next(numbers))))
+
+    limits = httpx.Limits(max_connections=readers + writers)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(reader(client, index, deadline) for index in range(readers)),
+            *(writer(client, deadline) for _ in range(writers))
+        )
+        elapsed = time.perf_counter() - started
+
+    results = {}
+    for kind, values in latencies.items():
+        quantiles = statistics.quantiles(values, n=100) if len(values) > 1 else [0.0] * 99
+        results[kind] = (len(values) / elapsed, quantiles[49] * 1000, quantiles[94] * 1000, quantiles[98] * 1000, errors[kind])
+    return results
+
+
+def _serve(environment: dict, port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=environment, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    for _ in range(120):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("The API did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare SQLite with and without the SQLITE_* performance profile.")
+    parser.add_argument("--database", default="employee_attendance.db", help="SQLite database to start from; it is copied, not modified")
+    parser.add_argument("--commits", type=int, default=1000, help="Single-record ingests timed per mode")
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=15, help="Duration of the mixed HTTP load per mode; 0 skips it")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--measure-commits", action="store_true", help=argparse.SUPPRESS)  # Child process of one mode
+    args = parser.parse_args()
+
+    if args.measure_commits:
+        print(measure_commits(args.commits))
+        sys.exit()
+
+    for mode, tuning in MODES.items():
+        with tempfile.TemporaryDirectory(prefix="sqlite-benchmark-") as workdir:
+            # The pragmas are applied when the engine is created, so each mode runs in its own process
+            database = os.path.join(workdir, "commits.db")
+            copy_database(args.database, database)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--measure-commits", "--commits", str(args.commits)],
+                env=_environment(database, tuning, workdir), capture_output=True, text=True, check=True
+            ).stdout
+            print(f"{mode:>8}: {float(output.split()[-1]):.0f} single-record ingest commits/s")
+
+            if args.seconds <= 0:
+                continue
+            database = os.path.join(workdir, "mixed.db")
+            copy_database(args.database, database)
+            server = _serve(_environment(database, tuning, workdir), args.port)
+            try:
+                results = asyncio.run(mixed_load(f"http://127.0.0.1:{args.port}", args.readers, args.writers, args.seconds))
+            finally:
+                server.terminate()
+                server.wait()
+            for kind, (rate, p50, p95, p99, errors) in results.items():
+                print(f"{'':>8}  {kind}: {rate:.1f}/s p50 {p50:.0f}ms p95 {p95:.0f}ms p99 {p99:.0f}ms errors {errors}")
@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, func, inspect, select, text
+
+from database import Base
+from migrations import find_duplicate_attendance, remove_duplicate_attendance, run_migrations
+from models import Attendance
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        # The attendance key as it was before it became unique
+        connection.execute(text("DROP INDEX ix_attendances_employee_id_date"))
+        connection.execute(text("CREATE INDEX ix_attendances_employee_id_date ON attendances (employee_id, date)"))
+        connection.execute(Attendance.__table__.insert(), [
+            {'employee_id': 1, 'date': date(2024, 1, 2), 'status': 'leave'},
+            {'employee_id': 1, 'date': date(2024, 1, 2), 'status': 'present'},
+            {'employee_id': 2, 'date': date(2024, 1, 2), 'status': 'present'},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def _unique_key(engine) -> bool:
+    indexes = {index["name"]: index for index in inspect(engine).get_indexes("attendances")}
+    return bool(indexes["ix_attendances_employee_id_date"]["unique"])
+
+
+def test_migration_refuses_to_remove_duplicates(engine):
+    with pytest.raises(RuntimeError, match="--remove-duplicates"):
+        run_migrations(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(Attendance)).scalar() == 3
+    assert not _unique_key(engine)
+
+
+def test_repair_keeps_the_latest_record_then_migration_runs(engine):
+    with engine.begin() as connection:
+        assert [record[0] for record in find_duplicate_attendance(connection)] == [1, 2]
+        removed = remove_duplicate_attendance(connection)
+    assert [(record[0], record[3]) for record in removed] == [(1, 'leave')]
+
+    run_migrations(engine)
+
+    assert _unique_key(engine)
+    with engine.connect() as connection:
+        assert connection.execute(select(Attendance.id, Attendance.status).order_by(Attendance.id)).all() == [(2, 'present'), (3, 'present')]
@@ -0,0 +1,19 @@
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+def test_openapi_schema_marks_only_the_anomaly_threshold_slider():
+    response = TestClient(app).get("/openapi.json")
+
+    assert response.status_code == 200
+    paths = response.json()["paths"]
+    sliders = [
+        (path, parameter["name"])
+        for path, operations in paths.items()
+        for operation in operations.values()
+        for parameter in operation.get("parameters", [])
+        if parameter.get("x-slider")
+    ]
+    assert sliders == [("/analytics/anomalies", "anomaly_threshold")]
+    assert "post" in paths["/analytics/anomalies/rescore/{employee_id}"]
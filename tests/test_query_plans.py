@@ -0,0 +1,137 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import Response
+from sqlalchemy import create_engine, event, inspect, select, text
+from sqlalchemy.orm import Session
+
+import database
+from attendance_rollup import rebuild_rollup
+from attendance_stats import compute_attendance_stats
+from database import Base
+from migrations import run_migrations
+from models import Attendance, Employee
+from prophet_attendance import load_training_frame
+from routers.attendance import _attendance_page, _employee_attendance_filters, get_attendance
+
+
+def _rows(days: int = 60, employees: int = 5):
+    first_day = date(2024, 1, 1)
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        for employee_id in range(1, employees + 1):
+            status = 'present' if (offset + employee_id) % 7 else 'leave'
+            checkin = datetime(day.year, day.month, day.day, 9) if status == 'present' else None
+            yield employee_id, day, checkin, status
+
+
+def _query_plans(engine, call) -> str:
+    """Runs `call` with a session on `engine` and returns the query plans of the SELECTs it executed."""
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    with Session(bind=engine) as db:
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            call(db)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        connection = db.connection()
+        return "\n".join(
+            row[-1]
+            for statement, parameters in statements
+            for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        )
+
+
+def _full_scans(plan: str) -> list:
+    return [line for line in plan.splitlines() if line.startswith("SCAN attendances") and "INDEX" not in line]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # The holiday calendar reads company holidays from the configured database, not this one
+    Base.metadata.create_all(bind=database.engine)
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _assert_indexes_used(engine):
+    with engine.connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+    # GET /attendance/
+    plan = _query_plans(engine, lambda db: get_attendance(
+        employee_id=3, response=Response(), cursor="2024-01-10:1", limit=100, stream=False, db=db
+    ))
+    assert "ix_attendances_employee_id_date" in plan and not _full_scans(plan)
+
+    # GET /attendance/employee/{employee_id}
+    plan = _query_plans(engine, lambda db: _attendance_page(
+        db.query(Attendance).filter(*_employee_attendance_filters(3, date(2024, 1, 10), date(2024, 2, 10))),
+        Response(), None, 100, descending=True
+    ))
+    assert "ix_attendances_employee_id_date" in plan and not _full_scans(plan)
+
+    # GET /attendance/predict/{employee_id} and POST /attendance/predict/batch train from these frames
+    plan = _query_plans(engine, lambda db: load_training_frame(db, 3))
+    assert "ix_attendances_employee_id_date" in plan and not _full_scans(plan)
+    plan = _query_plans(engine, lambda db: load_training_frame(db))
+    assert "ix_attendances_date_status" in plan
+
+
+def test_new_database_uses_attendance_indexes(engine):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(Employee.__table__.insert(), [
+            {'employee_id': employee_id, 'employee_name': f"Employee {employee_id}", 'department': f"Department {employee_id % 2}"}
+            for employee_id in range(1, 6)
+        ])
+        connection.execute(Attendance.__table__.insert(), [
+            {'employee_id': employee_id, 'date': day, 'checkin_time': checkin, 'status': status}
+            for employee_id, day, checkin, status in _rows()
+        ])
+
+    _assert_indexes_used(engine)
+
+    # GET /attendance-stats reads the daily rollup built from attendances instead
+    with Session(bind=engine) as db:
+        assert rebuild_rollup(db)
+        db.commit()
+    with engine.connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+    ranges = [(date(2024, 1, 1), date(2024, 2, 20), None), (date(2024, 1, 10), date(2024, 1, 10), date(2024, 1, 10))]
+    for start_date, end_date, target_date in ranges:
+        plan = _query_plans(engine, lambda db: compute_attendance_stats(db, start_date, end_date, target_date))
+        assert "sqlite_autoindex_attendance_daily_rollup_1" in plan
+        assert "SCAN attendance_daily_rollup" not in plan
+
+
+def test_migrated_database_uses_attendance_indexes(engine):
+    # The attendances table as created before is_weekday and the composite indexes existed
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE attendances (id INTEGER PRIMARY KEY, employee_id INTEGER, date DATE NOT NULL, "
+            "checkin_time DATETIME, checkout_time DATETIME, status VARCHAR(20))"
+        ))
+        connection.execute(
+            text("INSERT INTO attendances (employee_id, date, checkin_time, status) VALUES (:employee_id, :date, :checkin, :status)"),
+            [
+                {'employee_id': employee_id, 'date': day.isoformat(), 'checkin': checkin and checkin.isoformat(' '), 'status': status}
+                for employee_id, day, checkin, status in _rows()
+            ]
+        )
+
+    run_migrations(engine)
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("attendances")}
+    assert {"ix_attendances_employee_id_date", "ix_attendances_date_status"} <= indexes
+    with engine.connect() as connection:
+        weekday_flags = dict(connection.execute(select(Attendance.date, Attendance.is_weekday).distinct()).all())
+    assert all(is_weekday == (day.weekday() < 5) for day, is_weekday in weekday_flags.items())
+
+    _assert_indexes_used(engine)